@@ -0,0 +1,163 @@
+# Análisis de las votaciones
+# =============================================================================
+# Cada ronda se resume en una matriz jueces × frases de posiciones
+# normalizadas (0 = mejor, 1 = último puesto posible de la ronda; NaN si el
+# juez no la ordenó, p. ej. por quedar fuera de su top K). De ella salen, con
+# operaciones de NumPy y sin bucles por frase:
+#   • acuerdo entre cada par de jueces: Spearman (Pearson sobre las posiciones
+#     comunes) y Kendall tau-a (concordancia sobre los pares de frases);
+#   • desviación de cada juez respecto al consenso (media de los jueces) y su
+#     sesgo por autor (cuánto mejor o peor que el consenso lo coloca);
+#   • controversia de cada frase (desviación típica entre jueces);
+#   • dispersión de las posiciones de cada jugador.
+#
+# round_stats() guarda sólo sumas, así que la temporada es la suma de las
+# rondas (merge) y cada ronda cerrada se calcula una vez y se cachea.
+# =============================================================================
+import numpy as np
+
+
+def rank_matrix(conn, round_id):
+    """(jueces, frases [(id, texto, autor)], matriz normalizada) o None si no hay votos."""
+    frases = conn.execute("SELECT id, texto, autor FROM frases WHERE round_id=? ORDER BY id", (round_id,)).fetchall()
+    votos = conn.execute("""
+        SELECT v.juez, v.frase_id, v.posicion
+        FROM votos v JOIN frases f ON f.id = v.frase_id
+        WHERE f.round_id=?""", (round_id,)).fetchall()
+    if not frases or not votos:
+        return None
+    jueces = sorted({v[0] for v in votos})
+    jidx = {j: i for i, j in enumerate(jueces)}
+    ids = np.fromiter((f[0] for f in frases), dtype=np.int64, count=len(frases))
+    fi = np.searchsorted(ids, np.fromiter((v[1] for v in votos), dtype=np.int64, count=len(votos)))
+    ji = np.fromiter((jidx[v[0]] for v in votos), dtype=np.int64, count=len(votos))
+    R = np.full((len(jueces), len(frases)), np.nan)
+    R[ji, fi] = np.fromiter((v[2] for v in votos), dtype=np.float64, count=len(votos))
+    return jueces, frases, (R - 1) / max(len(frases) - 1, 1)
+
+
+def _stats(jueces, frases, X):
+    J, F = X.shape
+    W = ~np.isnan(X)
+    Wf = W.astype(np.float64)
+    Xz = np.where(W, X, 0.0)
+
+    # Pearson por pares sobre las frases que ordenaron ambos jueces
+    n = Wf @ Wf.T
+    sx = Xz @ Wf.T           # sx[i, j]: suma de x_i sobre las frases comunes
+    sxx = (Xz * Xz) @ Wf.T
+    sxy = Xz @ Xz.T
+
+    # Kendall: signo de cada par de frases (a < b) para cada juez
+    a, b = np.triu_indices(F, 1)
+    D = np.sign(X[:, a] - X[:, b])
+    V = ~np.isnan(D)
+    Dz = np.where(V, D, 0.0)
+    conc = Dz @ Dz.T
+    pares = V.astype(np.float64) @ V.T.astype(np.float64)
+
+    # consenso por frase y desviaciones de cada juez
+    cnt = Wf.sum(axis=0)
+    consenso = np.divide(Xz.sum(axis=0), cnt, out=np.full(F, np.nan), where=cnt > 0)
+    diff = np.where(W, consenso - X, 0.0)      # > 0: el juez la pone mejor que el consenso
+    autores = sorted({f[2] for f in frases})
+    aidx = {x: i for i, x in enumerate(autores)}
+    fa = np.fromiter((aidx[f[2]] for f in frases), dtype=np.int64, count=F)
+    flat = (np.arange(J)[:, None] * len(autores) + fa[None, :]).ravel()
+    sesgo = np.bincount(flat, weights=diff.ravel(), minlength=J * len(autores)).reshape(J, -1)
+    sesgo_n = np.bincount(flat, weights=Wf.ravel(), minlength=J * len(autores)).reshape(J, -1)
+
+    # controversia: desviación típica entre jueces de cada frase
+    m2 = np.divide((Xz * Xz).sum(axis=0), cnt, out=np.zeros(F), where=cnt > 0)
+    std = np.sqrt(np.clip(m2 - np.nan_to_num(consenso) ** 2, 0.0, None))
+    top = np.argsort(-std, kind="stable")
+
+    return {
+        "jueces": list(jueces),
+        "autores": autores,
+        "n": n, "sx": sx, "sxx": sxx, "sxy": sxy,
+        "conc": conc, "pares": pares,
+        "dev": np.abs(diff).sum(axis=1), "dev_n": Wf.sum(axis=1),
+        "sesgo": sesgo, "sesgo_n": sesgo_n,
+        "pos_n": np.bincount(fa, weights=cnt, minlength=len(autores)),
+        "pos_s1": np.bincount(fa, weights=Xz.sum(axis=0), minlength=len(autores)),
+        "pos_s2": np.bincount(fa, weights=(Xz * Xz).sum(axis=0), minlength=len(autores)),
+        "controversia": [(frases[i][1], frases[i][2], float(std[i])) for i in top],
+    }
+
+
+def round_stats(pool, round_id):
+    """Sumas de una ronda (ver merge/summary), o None si no tiene votos."""
+    with pool.connection() as c:
+        m = rank_matrix(c, round_id)
+    return _stats(*m) if m else None
+
+
+def merge(parts):
+    """Suma las estadísticas de varias rondas (jueces y autores por nombre)."""
+    parts = [p for p in parts if p]
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    jueces = sorted({j for p in parts for j in p["jueces"]})
+    autores = sorted({x for p in parts for x in p["autores"]})
+    jidx = {j: i for i, j in enumerate(jueces)}
+    aidx = {x: i for i, x in enumerate(autores)}
+    J, A = len(jueces), len(autores)
+    out = {"jueces": jueces, "autores": autores, "controversia": []}
+    for k in ("n", "sx", "sxx", "sxy", "conc", "pares"):
+        out[k] = np.zeros((J, J))
+    for k in ("dev", "dev_n"):
+        out[k] = np.zeros(J)
+    for k in ("sesgo", "sesgo_n"):
+        out[k] = np.zeros((J, A))
+    for k in ("pos_n", "pos_s1", "pos_s2"):
+        out[k] = np.zeros(A)
+    for p in parts:
+        jj = np.array([jidx[j] for j in p["jueces"]])
+        aa = np.array([aidx[x] for x in p["autores"]])
+        for k in ("n", "sx", "sxx", "sxy", "conc", "pares"):
+            out[k][np.ix_(jj, jj)] += p[k]
+        for k in ("dev", "dev_n"):
+            out[k][jj] += p[k]
+        for k in ("sesgo", "sesgo_n"):
+            out[k][np.ix_(jj, aa)] += p[k]
+        for k in ("pos_n", "pos_s1", "pos_s2"):
+            out[k][aa] += p[k]
+        out["controversia"].extend(p["controversia"])
+    out["controversia"].sort(key=lambda r: -r[2])
+    return out
+
+
+def _div(a, b):
+    return np.divide(a, b, out=np.full(np.shape(a), np.nan), where=b > 0)
+
+
+def summary(s):
+    """Métricas derivadas de las sumas: matrices de acuerdo y tablas por juez y jugador."""
+    n = s["n"]
+    sy, syy = s["sx"].T, s["sxx"].T
+    cov = s["sxy"] - _div(s["sx"] * sy, n)
+    vx = s["sxx"] - _div(s["sx"] ** 2, n)
+    vy = syy - _div(sy ** 2, n)
+    spearman = _div(cov, np.sqrt(np.clip(vx * vy, 0.0, None)))
+    kendall = _div(s["conc"], s["pares"])
+    J = len(s["jueces"])
+    otros = ~np.eye(J, dtype=bool)
+    with np.errstate(invalid="ignore"):
+        acuerdo = np.array([np.nanmean(kendall[i, otros[i]]) if J > 1 else np.nan for i in range(J)])
+    media = _div(s["pos_s1"], s["pos_n"])
+    disp = np.sqrt(np.clip(_div(s["pos_s2"], s["pos_n"]) - media ** 2, 0.0, None))
+    return {
+        "jueces": s["jueces"],
+        "autores": s["autores"],
+        "spearman": spearman,
+        "kendall": kendall,
+        "acuerdo": acuerdo,
+        "desviacion": _div(s["dev"], s["dev_n"]),
+        "sesgo": _div(s["sesgo"], s["sesgo_n"]),
+        "posicion_media": media,
+        "dispersion": disp,
+        "controversia": s["controversia"],
+    }
@@ -6,182 +6,129 @@
 #   • Panel Admin recupera las tres opciones: **Añadir**, Desactivar y Rehabilitar.
 # =============================================================================
 import streamlit as st
-import sqlite3
 import numpy as np
+import os
 import random
+import uuid
 import datetime as dt
+import analytics
+import cache
+import db
+import directory
+import leagues
+import ledger
+import live
+import perf
+import rounds
+import schema
+import scoring
+import search
+import settings
+import shop
+import storage
+
+# TWOWTE_DB permite apuntar a otra base (benchmarks, pruebas) sin tocar el código
+DB = os.environ.get("TWOWTE_DB", "game.db")
+st.set_page_config(page_title="TWOWTE", page_icon="📝", layout="centered")
+
+# ---------- 0. Liga de la sesión (sólo con TWOWTE_LEAGUES) -------------------
+LEAGUES = leagues.folder()
+if LEAGUES:
+    liga = st.session_state.get("liga") or st.query_params.get("liga")
+    ligas = leagues.available(LEAGUES)
+    if liga not in ligas:
+        st.title("TWOWTE")
+        if not ligas:
+            st.error("No hay ligas: créalas con `python leagues.py add <nombre>`")
+            st.stop()
+        liga = st.sidebar.selectbox("Liga", ligas)
+        if not st.sidebar.button("Elegir liga"):
+            st.stop()
+    st.session_state["liga"] = liga
+    DB = leagues.path(LEAGUES, liga)
+    st.sidebar.caption(f"Liga: **{liga}**")
+    if st.sidebar.button("Cambiar de liga"):
+        # usuarios y rondas son de cada liga: la sesión empieza de cero
+        st.session_state.clear()
+        st.query_params.clear()
+        st.rerun()
 
-DB = "game.db"
-conn = sqlite3.connect(DB, check_same_thread=False)
-c = conn.cursor()
-
-# ---------- 1. Esquema de tablas --------------------------------------------
-c.execute("""
-CREATE TABLE IF NOT EXISTS users(
-  username TEXT PRIMARY KEY,
-  password TEXT NOT NULL,
-  role TEXT NOT NULL,            -- 'jugador' | 'juez'
-  is_admin INTEGER NOT NULL,
-  coins INTEGER NOT NULL DEFAULT 0,
-  active INTEGER NOT NULL DEFAULT 1)
-""")
-
-c.execute("CREATE TABLE IF NOT EXISTS settings(clave TEXT PRIMARY KEY, valor TEXT)")
-
-c.execute("""
-CREATE TABLE IF NOT EXISTS rounds(
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  numero INTEGER NOT NULL,
-  status TEXT NOT NULL,
-  created_at TEXT NOT NULL)
-""")
-
-c.execute("""
-CREATE TABLE IF NOT EXISTS frases(
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  texto TEXT NOT NULL,
-  autor TEXT NOT NULL,
-  round_id INTEGER NOT NULL)
-""")
-
-c.execute("""
-CREATE TABLE IF NOT EXISTS votos(
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  juez TEXT NOT NULL,
-  frase_id INTEGER NOT NULL,
-  posicion INTEGER NOT NULL)
-""")
-
-c.execute("""
-CREATE TABLE IF NOT EXISTS player_round(
-  round_id INTEGER NOT NULL,
-  username TEXT NOT NULL,
-  responses_left INTEGER NOT NULL,
-  df_flag INTEGER NOT NULL DEFAULT 0,
-  multiplier INTEGER NOT NULL DEFAULT 1,
-  penalty INTEGER NOT NULL DEFAULT 0,
-  PRIMARY KEY(round_id,username))
-""")
-
-c.execute("""
-CREATE TABLE IF NOT EXISTS purchases(
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  round_id INTEGER NOT NULL,
-  username TEXT NOT NULL,
-  item TEXT NOT NULL,
-  meta TEXT)
-""")
-conn.commit()
-# aseguramos que la columna penalty exista si la tabla venía de versiones previas
-try:
-    c.execute("ALTER TABLE player_round ADD COLUMN penalty INTEGER NOT NULL DEFAULT 0")
-    conn.commit()
-except sqlite3.OperationalError:
-    pass
-
-# ---------- 2. Seed: solo admin con 0 monedas -------------------------------
-if c.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
-    c.execute("INSERT INTO users VALUES(?,?,?,?,?,?)", ("Jlarriva", "FioreIsQueen", "juez", 1, 0, 1))
-    conn.commit()
-
-# ---------- 3. Ajustes por defecto ------------------------------------------
-DEFAULTS = {
-  "titulo": "TWOWTE – Reality de Frases",
-  "current_round": "1",
-  "reward_first": "10",
-  "reward_second": "7",
-  "reward_third": "5",
-  "reward_45": "3",
-  "reward_participate": "1"
-}
-for k, v in DEFAULTS.items():
-    c.execute("INSERT OR IGNORE INTO settings VALUES(?,?)", (k, v))
-conn.commit()
-get_setting = lambda k: c.execute("SELECT valor FROM settings WHERE clave=?", (k,)).fetchone()[0]
-set_setting = lambda k, v: (c.execute("REPLACE INTO settings VALUES(?,?)", (k, str(v))), conn.commit())
-
-# ---------- 4. Garantizar ronda abierta -------------------------------------
-current_round = int(get_setting("current_round"))
-open_r = c.execute("SELECT id FROM rounds WHERE numero=? AND status='open'", (current_round,)).fetchone()
-if not open_r:
-    c.execute("INSERT INTO rounds(numero,status,created_at) VALUES(?,?,?)", (current_round, 'open', dt.datetime.utcnow().isoformat()))
-    rid = c.lastrowid
-    players = c.execute("SELECT username FROM users WHERE active=1").fetchall()
-    c.executemany("INSERT INTO player_round(round_id,username,responses_left) VALUES(?,?,1)", [(rid, p[0]) for p in players])
-    conn.commit()
-    open_r = (rid,)
-round_id = open_r[0]
+# ---------- 1-3. Esquema, seed del admin y ajustes por defecto ---------------
+@st.cache_resource
+def bootstrap(path, league=False):
+    """Una vez por base: pool ya migrado, cachés de ajustes y lecturas y el hilo que cierra rondas."""
+    pool = leagues.get_pool(path) if league else db.get_pool(path)
+    schema.migrate(pool)
+    with pool.tx() as c:
+        # Seed: solo admin con 0 monedas
+        if c.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+            c.execute("INSERT INTO users VALUES(?,?,?,?,?,?)", ("Jlarriva", "FioreIsQueen", "juez", 1, 0, 1))
+        c.executemany("INSERT OR IGNORE INTO settings VALUES(?,?)", settings.DEFAULTS.items())
+    if os.environ.get("TWOWTE_PERF") == "1":
+        perf.enable(pool)
+    cfg = settings.Settings(pool)
+    rounds.open_round(pool, cfg)
+    return pool, cfg, cache.ReadCache(pool), rounds.RoundCloser(pool, cfg)
+
+pool, cfg, reads, closer = bootstrap(DB, bool(LEAGUES))
+store = storage.SQLiteStorage(pool)   # escrituras del juego (storage.py)
+if "_perf_sid" not in st.session_state:
+    st.session_state["_perf_sid"] = uuid.uuid4().hex[:8]
+perf.begin_rerun(st.session_state["_perf_sid"], st.session_state.get("user"))
+get_setting = cfg.get        # valores ya tipados (int para recompensas y ronda)
+set_setting = cfg.set        # write-through
+
+# ---------- 4. Ronda abierta ------------------------------------------------
+round_id, current_round = rounds.open_round(pool, cfg)
+# versiones de lo que leen las vistas; mientras no cambien, todo sale de la caché
+ver = reads.versions(cache.round_key(round_id), "rounds", "users")
 
 # ---------- 5. Utilidades ----------------------------------------------------
-# Función para cerrar ronda automáticamente cuando todos los jueces han votado
+# directorio sin contraseñas, reconstruido sólo cuando cambia la tabla users
+users = reads.get(ver["users"], directory.load, pool)
+
+def load_round(rid):
+    """Todo lo que las vistas leen de una ronda abierta, en una sola pasada."""
+    with pool.connection() as c:
+        frases = c.execute("SELECT id, texto, autor FROM frases WHERE round_id=?", (rid,)).fetchall()
+        return {
+            "frases": frases,
+            "autores": frozenset(f[2] for f in frases),
+            "respuestas": dict(c.execute("SELECT username, responses_left FROM player_round WHERE round_id=?", (rid,)).fetchall()),
+            "compras": {u: (itm, meta) for u, itm, meta in c.execute("SELECT username, item, meta FROM purchases WHERE round_id=?", (rid,))},
+            "jueces": frozenset(j for (j,) in c.execute("SELECT juez FROM ballots WHERE round_id=?", (rid,))),
+            "voto_id": c.execute("SELECT COALESCE(MAX(v.id), 0) FROM votos v JOIN frases f ON f.id = v.frase_id WHERE f.round_id=?", (rid,)).fetchone()[0],
+        }
+ronda = reads.get(ver[cache.round_key(round_id)], load_round, round_id)
+
+def load_last_closed():
+    """(id, numero, tabla, eliminado) de la última ronda cerrada, o None."""
+    with pool.connection() as c:
+        last = c.execute("SELECT id, numero FROM rounds WHERE status='closed' ORDER BY numero DESC LIMIT 1").fetchone()
+        if not last:
+            return None
+        res = scoring.score_round(c, last[0])
+        elim = c.execute("SELECT username FROM round_results WHERE round_id=? AND eliminated=1", (last[0],)).fetchone()
+    return last[0], last[1], res["tabla"] if res else None, elim[0] if elim else None
+
+def load_analytics(rid=None):
+    """Resumen de analytics de una ronda cerrada o, con rid=None, de toda la temporada."""
+    # las rondas cerradas no cambian: sus sumas se cachean sin versión
+    if rid is not None:
+        stats = reads.get(0, analytics.round_stats, pool, rid)
+    else:
+        ids = [r for (r,) in pool.fetchall("SELECT id FROM rounds WHERE status='closed' ORDER BY numero")]
+        stats = analytics.merge([reads.get(0, analytics.round_stats, pool, r) for r in ids])
+    return analytics.summary(stats) if stats else None
 
-def auto_close_round():
-    global current_round, round_id
-    frases = c.execute("SELECT id, texto, autor FROM frases WHERE round_id=?", (round_id,)).fetchall()
-    if not frases:
-        return
-    N = len(frases)
-    pts = {fid: 0 for fid, _, _ in frases}
-    pos_map = {fid: [] for fid, _, _ in frases}
-    for fid, pos in c.execute(
-        "SELECT frase_id, posicion FROM votos WHERE frase_id IN (SELECT id FROM frases WHERE round_id=? )",
-        (round_id,)):
-        pts[fid] += N + 1 - pos
-        pos_map[fid].append(pos)
-
-    results = []
-    for fid, txt, aut in frases:
-        std = float(np.std(pos_map[fid])) if pos_map[fid] else 0.0
-        pen = c.execute("SELECT penalty FROM player_round WHERE round_id=? AND username=?", (round_id, aut)).fetchone()[0]
-        total = pts[fid] + pen
-        df  = c.execute("SELECT df_flag FROM player_round WHERE round_id=? AND username=?", (round_id, aut)).fetchone()[0]
-        results.append({"Autor": aut, "Puntos": total, "DF": bool(df), "STD": std, "Frase": txt})
-    results.sort(key=lambda r: (r["Puntos"], r["DF"], r["STD"]), reverse=True)
-
-    st.subheader(f"Resultados ronda {current_round}")
-    st.table(results)
-
-    # premios
-    recomp = [int(get_setting("reward_first")), int(get_setting("reward_second")), int(get_setting("reward_third")), int(get_setting("reward_45")), int(get_setting("reward_45"))]
-    orden = [r["Autor"] for r in results]
-    for idx, pl in enumerate(orden):
-        reward = recomp[idx] if idx < len(recomp) else int(get_setting("reward_participate"))
-        mult = c.execute("SELECT multiplier FROM player_round WHERE round_id=? AND username=?", (round_id, pl)).fetchone()[0]
-        c.execute("UPDATE users SET coins = coins + ? WHERE username=?", (reward * mult, pl))
-
-    # Determinar eliminado: peor "mejor" puesto
-    best_pos = {}
-    for idx, auth in enumerate(orden):
-        if auth not in best_pos:
-            best_pos[auth] = idx  # primera aparición (mejor puesto)
-    eliminado = sorted(best_pos.items(), key=lambda x: x[1])[-1][0]
-    c.execute("UPDATE users SET active=0 WHERE username=?", (eliminado,))
-    c.execute("UPDATE rounds SET status='closed' WHERE id=?", (round_id,))
-
-    # preparar nueva ronda
-    next_num = current_round + 1
-    set_setting("current_round", next_num)
-    c.execute("INSERT INTO rounds(numero,status,created_at) VALUES(?,?,?)", (next_num, 'open', dt.datetime.utcnow().isoformat()))
-    new_rid = c.lastrowid
-    activos = c.execute("SELECT username FROM users WHERE active=1").fetchall()
-    c.executemany("INSERT INTO player_round(round_id, username, responses_left) VALUES(?,?,1)", [(new_rid, a[0]) for a in activos])
-    conn.commit()
-
-    round_id = new_rid
-    current_round = next_num
-    st.success(f"Ronda {next_num -1} cerrada automáticamente. Eliminado: {eliminado}. ¡Nueva ronda disponible!")
-
-
-def load_users(active_only=False):
-    q = "SELECT username,password,role,is_admin,coins,active FROM users" + (" WHERE active=1" if active_only else "")
-    return {u[0]: u for u in c.execute(q).fetchall()}
-users = load_users()
+def load_standings():
+    return {u: (n_wins, avg_rank) for u, n_wins, avg_rank in pool.fetchall(
+        "SELECT username, SUM(rank = 1), AVG(rank) FROM round_results GROUP BY username")}
 
 def total_judges():
-    return sum(1 for u in users.values() if u[2] == 'juez' and u[5] == 1)
+    return users.count('juez')
 
 # ---------- 6. Streamlit & sesión -------------------------------------------
-st.set_page_config(page_title="TWOWTE", page_icon="📝", layout="centered")
 if 'user' not in st.session_state:
     st.session_state['user'] = None
     st.session_state['is_admin'] = False
@@ -194,94 +141,157 @@ if not st.session_state['user']:
     u = st.sidebar.text_input("Usuario")
     p = st.sidebar.text_input("Contraseña", type="password")
     if st.sidebar.button("Entrar"):
-        if u in users and users[u][1] == p and users[u][5] == 1:
+        ok = store.login(u, p)
+        if ok:
             st.session_state['user'] = u
-            st.session_state['is_admin'] = bool(users[u][3])
+            st.session_state['is_admin'] = bool(ok[0])
             st.rerun()
         else:
             st.sidebar.error("Credenciales incorrectas o cuenta inactiva")
     st.stop()
 
-# ---------- 7. Tabs ----------------------------------------------------------
-base_tabs = ["Acción", "Tienda", "Resultados", "Historial"]
-if st.session_state['is_admin']:
-    base_tabs.append("Admin")
-tabs = st.tabs(base_tabs)
-
+# ---------- 7. Contexto de la sesión ---------------------------------------
+# Se resuelve una vez por rerun y lo comparten todas las vistas
 username = st.session_state['user']
 is_admin = st.session_state['is_admin']
+role = users.role(username, 'jugador')
+
+# Estado en vivo de la ronda (live.py): se resiembra desde la caché cuando el
+# rerun completo trae una versión más nueva que la que ya conocía la sesión
+LIVE_EVERY = get_setting("live_interval") or None
+vivo = st.session_state.get("live")
+if vivo is None or vivo["round_id"] != round_id or vivo["version"] != ver[cache.round_key(round_id)]:
+    st.session_state["live"] = live.new_state(round_id, ver[cache.round_key(round_id)], ronda)
+else:
+    vivo["fresh"] = True
+
+def live_tick():
+    """Estado en vivo tras un tick; si la ronda se cerró recarga la página entera."""
+    vivo = st.session_state["live"]
+    live.tick(pool, vivo)
+    if vivo["closed"]:
+        st.rerun(scope="app")
+    return vivo
 
 ###############################################################################
 # ACCIÓN                                                                      #
 ###############################################################################
-with tabs[0]:
-    # Botón para refrescar sin cerrar sesión
-    if st.button("🔄 Recargar valores"):
+PAGE = 15  # frases por página en la papeleta del juez
+
+@st.fragment(run_every=LIVE_EVERY)
+def live_votacion():
+    # Interfaz de votación para jueces; las frases nuevas aparecen solas
+    vivo = live_tick()
+    frases_j = vivo["frases"]
+    if not frases_j:
+        st.warning("Aún no hay frases para votar.")
+        return
+    labels = [txt for _, txt, _ in frases_j]
+    id_map = {txt: fid for fid, txt, _ in frases_j}
+    # papeleta parcial: sólo se ordenan las top_k mejores (0 = todas)
+    top_k = get_setting("ballot_top_k")
+    k = min(top_k, len(labels)) if top_k else len(labels)
+    if username in vivo["jueces"]:
+        st.caption("Ya enviaste tu voto en esta ronda; si lo reenvías se reemplaza.")
+    paginas = (len(labels) - 1) // PAGE + 1
+    pag = st.number_input("Página", min_value=1, max_value=paginas, value=1, key="rank_page") if paginas > 1 else 1
+    desde = (pag - 1) * PAGE
+    pagina = labels[desde:desde + PAGE]
+    st.markdown("\n".join(f"{i}. {txt}" for i, txt in enumerate(pagina, desde + 1)))
+    # La papeleta se arma por páginas: cada página tiene su propio selector y al
+    # enviar su elección se fusiona con lo ya elegido en las demás, que queda en
+    # la sesión. Cuando hay k frases se registra el voto.
+    papeleta = st.session_state.get("seleccion")
+    if not papeleta or papeleta["round_id"] != round_id:
+        papeleta = st.session_state["seleccion"] = {"round_id": round_id, "ranking": []}
+    en_pagina = set(pagina)
+    otras = [label for label in papeleta["ranking"] if label not in en_pagina]
+    if paginas > 1 and papeleta["ranking"]:
+        st.caption("Tu papeleta: " + " · ".join(f"{i}. {label}" for i, label in enumerate(papeleta["ranking"], 1)))
+    # dentro de un form elegir frases no provoca reruns: todo se envía de una vez
+    with st.form("papeleta"):
+        elegidas = st.multiselect("Ordena de mejor a peor", pagina, max_selections=max(k - len(otras), 1),
+                                  default=[label for label in papeleta["ranking"] if label in en_pagina],
+                                  key=f"rank_{pag}", help=f"Elige tus {k} frases favoritas, la mejor primero.")
+        enviar = st.form_submit_button("Enviar voto")
+    if enviar:
+        # las de esta página van detrás de las elegidas en otras páginas
+        ranking = otras + elegidas
+        if len(ranking) > k:
+            st.info(f"Tu papeleta ya tiene {len(otras)} frases de otras páginas: quita alguna antes de añadir más.")
+            return
+        papeleta["ranking"] = ranking
+        if len(ranking) < k:
+            donde = "; puedes seguir en otra página" if paginas > 1 else ""
+            st.info(f"Elige {k} frases para completar tu papeleta ({len(ranking)} elegidas{donde}).")
+            return
+        ok = store.submit_ballot(round_id, username, [id_map[label] for label in ranking])
+        if ok:
+            # el hilo de cierre comprueba si era la última papeleta
+            closer.request(round_id)
+            st.success("Voto registrado")
+        else:
+            st.error("La ronda ya está cerrada")
+
+@st.fragment(run_every=LIVE_EVERY)
+def live_pendientes():
+    enviados = live_tick()["autores"]
+    if len(enviados) >= 2:
+        faltan = [u for u in users.names('jugador', 1) if u not in enviados]
+        random.shuffle(faltan)
+        st.write("Pendientes:", ", ".join(faltan) if faltan else "Todos han enviado")
+
+def view_accion():
+    # Sin refresco en vivo queda el botón para recargar sin cerrar sesión
+    if LIVE_EVERY is None and st.button("🔄 Recargar valores"):
         st.rerun()
 
-    role = users[username][2]
     if role == 'juez':
         st.info("Eres juez: no envías frases, solo votas.")
-        # Interfaz de votación para jueces
-        frases_j = c.execute("SELECT id, texto FROM frases WHERE round_id=?", (round_id,)).fetchall()
-        if not frases_j:
-            st.warning("Aún no hay frases para votar.")
-        else:
-            labels = [txt for _, txt in frases_j]
-            id_map = {txt: fid for fid, txt in frases_j}
-            ranking = st.multiselect("Ordena de mejor a peor", labels, default=[], key="rank")
-            if len(ranking) == len(labels):
-                if st.button("Enviar voto"):
-                    c.execute("DELETE FROM votos WHERE juez=? AND frase_id IN (SELECT id FROM frases WHERE round_id=? )", (username, round_id))
-                    for pos, label in enumerate(ranking, 1):
-                        fid = id_map[label]
-                        c.execute("INSERT INTO votos(juez, frase_id, posicion) VALUES(?,?,?)", (username, fid, pos))
-                    conn.commit(); st.success("Voto registrado")
-            else:
-                st.info("Selecciona todas las frases para completar el ranking.")
+        live_votacion()
     else:
         # Formulario de envío para jugadores
-        pr_state = c.execute("SELECT responses_left FROM player_round WHERE round_id=? AND username=?", (round_id, username)).fetchone()
-        if not pr_state:
+        left = ronda["respuestas"].get(username)
+        if left is None:
             st.error("No participas en esta ronda.")
         else:
-            left = pr_state[0]
             st.info(f"Respuestas restantes: {left}")
             if left > 0:
                 frase_txt = st.text_input("Tu frase:")
                 if st.button("Enviar frase") and frase_txt.strip():
-                    c.execute("INSERT INTO frases(texto, autor, round_id) VALUES(?,?,?)", (frase_txt.strip(), username, round_id))
-                    c.execute("UPDATE player_round SET responses_left = responses_left - 1 WHERE round_id=? AND username=?", (round_id, username))
-                    conn.commit(); st.success("Frase enviada"); st.rerun()
-            enviados = set(x[0] for x in c.execute("SELECT DISTINCT autor FROM frases WHERE round_id=?", (round_id,)))
-            if len(enviados) >= 2:
-                faltan = [u for u in users if users[u][5] == 1 and users[u][2] == 'jugador' and u not in enviados]
-                random.shuffle(faltan)
-                st.write("Pendientes:", ", ".join(faltan) if faltan else "Todos han enviado")
+                    with store.tx():
+                        # dentro de la transacción: dos envíos simultáneos no pasan ambos
+                        repetida = store.duplicate(round_id, frase_txt)
+                        enviada = not repetida and store.add_phrase(round_id, username, frase_txt)
+                    if repetida:
+                        st.error("Esa frase ya se ha enviado en esta ronda")
+                    elif not enviada:
+                        st.error("No te quedan respuestas en esta ronda")
+                    else:
+                        st.success("Frase enviada"); st.rerun()
+            live_pendientes()
 
 # TIENDA                                                                      #
 ###############################################################################
-SHOP = {"Doble Respuesta": 10, "Triple Respuesta": 25, "Desempate Favorable": 8, "Ruleta del Tigre": 9, "Duplicador de Monedas": 12}
-with tabs[1]:
+SHOP = shop.SHOP
+def view_tienda():
     # Manejo de Ruleta pendiente
     if st.session_state.get("pending_ruleta", False) and st.session_state.get("ruleta_buyer") == username:
         st.subheader("Configurar Ruleta del Tigre")
         r1 = st.text_input("Jugador 1")
         r2 = st.text_input("Jugador 2")
         if st.button("Ejecutar Ruleta"):
-            users = load_users()
-            valid = all(r in users and users[r][5] == 1 for r in [r1, r2]) and r1 != r2 and r1 not in ["", username] and r2 not in ["", username]
+            valid = all(users.is_active(r) for r in [r1, r2]) and r1 != r2 and r1 not in ["", username] and r2 not in ["", username]
             if valid:
                 price = SHOP["Ruleta del Tigre"]
-                coins_user = c.execute("SELECT coins FROM users WHERE username=?", (username,)).fetchone()[0]
+                coins_user = store.user(username)[directory.COINS]
                 if coins_user < price:
                     st.error("Monedas insuficientes")
                 else:
                     loser = random.choice([username, r1, r2])
-                    c.execute("UPDATE users SET coins = coins - 3 WHERE username=?", (loser,))
-                    c.execute("UPDATE users SET coins = coins - ? WHERE username=?", (price, username))
-                    c.execute("INSERT INTO purchases(round_id, username, item, meta) VALUES(?,?,?,?)", (round_id, username, "Ruleta del Tigre", f"{r1}|{r2}"))
-                    conn.commit()
+                    with store.tx():
+                        store.add_coins([(username, round_id, -price, ledger.COMPRA), (loser, round_id, -shop.RULETA_PENALTY, ledger.RULETA)])
+                        store.add_purchase(round_id, username, "Ruleta del Tigre", f"{r1}|{r2}")
                     st.success(f"Perdedor: {loser}")
                     # reset flags
                     st.session_state["pending_ruleta"] = False
@@ -291,10 +301,9 @@ with tabs[1]:
                 st.error("Jugadores inválidos o repetidos")
         st.stop()
 
-    row_coins = c.execute("SELECT coins FROM users WHERE username=?", (username,)).fetchone()
-    coins = row_coins[0] if row_coins else 0
+    coins = users.coins(username)
     st.write(f"Monedas: **{coins}**")
-    bought = c.execute("SELECT item FROM purchases WHERE round_id=? AND username=?", (round_id, username)).fetchone()
+    bought = ronda["compras"].get(username)
     if bought:
         st.info(f"Ya compraste {bought[0]} esta ronda.")
     else:
@@ -305,228 +314,298 @@ with tabs[1]:
                 if coins < price:
                     st.error("Monedas insuficientes")
                 else:
-                    # efectos inmediatos
-                    if itm == "Doble Respuesta":
-                        c.execute("UPDATE player_round SET responses_left = responses_left + 1 WHERE round_id=? AND username=?", (round_id, username))
-                    elif itm == "Triple Respuesta":
-                        c.execute("UPDATE player_round SET responses_left = responses_left + 2 WHERE round_id=? AND username=?", (round_id, username))
-                    elif itm == "Desempate Favorable":
-                        c.execute("UPDATE player_round SET df_flag = 1 WHERE round_id=? AND username=?", (round_id, username))
-                    elif itm == "Duplicador de Monedas":
-                        c.execute("UPDATE player_round SET multiplier = 2 WHERE round_id=? AND username=?", (round_id, username))
-                    elif itm == "Ruleta del Tigre":
+                    if itm == "Ruleta del Tigre":
                         # guardar estado en sesión y pedir nombres en nuevo render
                         st.session_state["pending_ruleta"] = True
                         st.session_state["ruleta_buyer"] = username
                         st.rerun()
-                    # Cobrar y registrar compra (genérico para otros ítems)
-                    c.execute("UPDATE users SET coins = coins - ? WHERE username=?", (price, username))
-                    c.execute("INSERT INTO purchases(round_id, username, item) VALUES(?,?,?)", (round_id, username, itm))
-                    conn.commit(); st.success("Compra aplicada"); st.rerun()
+                    with store.tx():
+                        # efectos inmediatos
+                        if itm in shop.EXTRA_RESPONSES:
+                            store.adjust_player(round_id, username, responses=shop.EXTRA_RESPONSES[itm])
+                        elif itm == "Desempate Favorable":
+                            store.adjust_player(round_id, username, df_flag=1)
+                        elif itm == "Duplicador de Monedas":
+                            store.adjust_player(round_id, username, multiplier=2)
+                        # Cobrar y registrar compra (genérico para otros ítems)
+                        store.add_coins([(username, round_id, -price, ledger.COMPRA)])
+                        store.add_purchase(round_id, username, itm)
+                    st.success("Compra aplicada"); st.rerun()
 
 ###############################################################################
 # RESULTADOS                                                                  #
 ###############################################################################
-with tabs[2]:
-    enviados = c.execute("SELECT COUNT(DISTINCT autor) FROM frases WHERE round_id=?", (round_id,)).fetchone()[0]
-    if enviados == 0:
+@st.fragment(run_every=LIVE_EVERY)
+def live_estado():
+    # Estado de la ronda abierta; al cerrarse, live_tick recarga la página
+    vivo = live_tick()
+    if not vivo["autores"]:
         st.info("Aún no hay frases enviadas.")
     else:
         need = total_judges()
-        got = c.execute(
-            "SELECT COUNT(DISTINCT juez) FROM votos WHERE frase_id IN (SELECT id FROM frases WHERE round_id=? )",
-            (round_id,)).fetchone()[0]
+        got = len(vivo["jueces"])
         if got < need:
             st.info(f"Faltan votos de {need - got} juez(es).")
         else:
-            # Cierre automático si la ronda sigue abierta
-            if c.execute("SELECT status FROM rounds WHERE id=?", (round_id,)).fetchone()[0] == 'open':
-                auto_close_round()
-
-            # ---- Mostrar resultados finales ----
-            frases = c.execute("SELECT id, texto, autor FROM frases WHERE round_id=?", (round_id,)).fetchall()
-            N = len(frases)
-            pts = {fid: 0 for fid, _, _ in frases}
-            pos_list = {fid: [] for fid, _, _ in frases}
-            for fid, pos in c.execute(
-                "SELECT frase_id, posicion FROM votos WHERE frase_id IN (SELECT id FROM frases WHERE round_id=? )",
-                (round_id,)):
-                pts[fid] += N + 1 - pos
-                pos_list[fid].append(pos)
-            results = []
-            for fid, txt, aut in frases:
-                std = float(np.std(pos_list[fid])) if pos_list[fid] else 0.0
-                df = c.execute("SELECT df_flag FROM player_round WHERE round_id=? AND username=?", (round_id, aut)).fetchone()[0]
-                pen = c.execute("SELECT penalty FROM player_round WHERE round_id=? AND username=?", (round_id, aut)).fetchone()[0]
-                total_pts = pts[fid] + pen  # sumar penalizaciones negativas o positivas
-                results.append({"Autor": aut, "Puntos": total_pts, "DF": bool(df), "STD": std, "Frase": txt})
-            results.sort(key=lambda r: (r["Puntos"], r["DF"], r["STD"]), reverse=True)
-            st.table(results)
-
-with tabs[3]:
-    # --- Historial de rondas ---
-    closed = c.execute("SELECT id, numero FROM rounds WHERE status='closed' ORDER BY numero").fetchall()
+            # El cierre lo hace el hilo en segundo plano; aquí sólo se le avisa
+            # (por si el proceso se reinició entre la última papeleta y el
+            # cierre), y no en cada tick si ya tiene la ronda en cola
+            if not closer.pending(round_id):
+                closer.request(round_id)
+            st.info("Todos los jueces han votado: cerrando la ronda…")
+
+def view_resultados():
+    live_estado()
+
+    # ---- Resultados de la última ronda cerrada ----
+    last = reads.get(ver["rounds"], load_last_closed)
+    if last and last[2]:
+        last_id, numero, tabla, elim = last
+        st.subheader(f"Resultados ronda {numero}")
+        st.table(tabla)
+        if elim:
+            st.caption(f"Eliminado: {elim}")
+        with st.expander("Análisis de las votaciones"):
+            if st.toggle("Toda la temporada", key="analisis_temporada"):
+                an = reads.get(ver["rounds"], load_analytics)
+            else:
+                an = reads.get(0, load_analytics, last_id)
+            if an:
+                view_analisis(an)
+            else:
+                st.info("No hay votos que analizar.")
+
+def _r(x, nd=2):
+    return "-" if np.isnan(x) else round(float(x), nd)
+
+def view_analisis(an):
+    jueces = an["jueces"]
+    st.caption("Acuerdo entre jueces (Kendall τ: 1 = mismo orden, -1 = orden inverso)")
+    st.table([{"Juez": j, **{k: _r(an["kendall"][i, c]) for c, k in enumerate(jueces)}} for i, j in enumerate(jueces)])
+    st.caption("Jueces: acuerdo medio con el resto y distancia media al consenso (0 = igual, 1 = opuesto)")
+    st.table([{"Juez": j, "Kendall medio": _r(an["acuerdo"][i]),
+               "Spearman medio": _r(np.nanmean(np.delete(an["spearman"][i], i))) if len(jueces) > 1 else "-",
+               "Desviación": _r(an["desviacion"][i], 3)} for i, j in enumerate(jueces)])
+    sesgo = an["sesgo"]
+    if np.isfinite(sesgo).any():
+        flat = np.argsort(-np.abs(np.nan_to_num(sesgo)), axis=None)[:5]
+        st.caption("Mayores sesgos juez → autor (> 0: lo coloca mejor que el consenso)")
+        st.table([{"Juez": jueces[i], "Autor": an["autores"][a], "Sesgo": _r(sesgo[i, a], 3)}
+                  for i, a in zip(*np.unravel_index(flat, sesgo.shape))])
+    st.caption("Frases más controvertidas (desviación típica de la posición entre jueces)")
+    st.table([{"Frase": t, "Autor": a, "STD": round(sd, 3)} for t, a, sd in an["controversia"][:5]])
+    st.caption("Jugadores: posición media y dispersión (0 = primero, 1 = último)")
+    st.table([{"Jugador": a, "Posición media": _r(an["posicion_media"][k], 3), "Dispersión": _r(an["dispersion"][k], 3)}
+              for k, a in enumerate(an["autores"])])
+
+def view_historial():
+    # --- Historial de rondas (desde la clasificación materializada) ---
     wins = {u: 0 for u in users}
-    avgs = {u: [] for u in users}
-    for rid, num in closed:
-        fr = c.execute("SELECT id, autor FROM frases WHERE round_id=?", (rid,)).fetchall()
-        N = len(fr)
-        pts = {a: 0 for _, a in fr}
-        for fid, pos in c.execute("SELECT frase_id, posicion FROM votos WHERE frase_id IN (SELECT id FROM frases WHERE round_id=? )", (rid,)):
-            aut = c.execute("SELECT autor FROM frases WHERE id=?", (fid,)).fetchone()[0]
-            pts[aut] += N + 1 - pos
-        if pts:
-            ranking = sorted(pts, key=pts.get, reverse=True)
-            wins[ranking[0]] += 1
-            for rk, p in enumerate(ranking, 1):
-                avgs[p].append(rk)
+    avgs = {u: None for u in users}
+    for u, (n_wins, avg_rank) in reads.get(ver["rounds"], load_standings).items():
+        wins[u] = n_wins
+        avgs[u] = avg_rank
     # Estadísticas de jugadores (sin jueces)
     stats = [{
         "Jugador": u,
         "Victorias": wins[u],
-        "Promedio": round(np.mean(avgs[u]), 2) if avgs[u] else "-"
-    } for u in users if users[u][2] == 'jugador']
+        "Promedio": round(avgs[u], 2) if avgs[u] is not None else "-"
+    } for u in users.names('jugador')]
     st.table(stats)
 
+    # --- Monedas del usuario al cierre de cada ronda (balance_snapshots) ---
+    hist = reads.get(ver["rounds"], ledger.history, pool, username)
+    if hist:
+        st.caption("Tus monedas al cierre de cada ronda")
+        st.line_chart({"Ronda": [n for n, _ in hist], "Monedas": [m for _, m in hist]}, x="Ronda", y="Monedas")
+
+    # --- Buscador de frases (índice FTS5) ---
+    st.subheader("Buscar frases")
+    q = st.text_input("Palabras", key="buscar_texto")
+    col1, col2 = st.columns(2)
+    autor = col1.selectbox("Autor", ["Todos"] + users.names('jugador'), key="buscar_autor")
+    numero = col2.number_input("Ronda (0 = todas)", min_value=0, step=1, key="buscar_ronda")
+    if q.strip() or autor != "Todos" or numero:
+        hits = search.search(pool, q, None if autor == "Todos" else autor, int(numero) or None)
+        if hits:
+            st.table([{"Ronda": n, "Autor": a, "Frase": t} for n, a, t in hits])
+        else:
+            st.info("Ninguna frase coincide")
+
 ###############################################################################
 # ADMIN                                                                       #
 ###############################################################################
-if is_admin:
-    with tabs[-1]:
-        st.header("Panel Admin")
-        # --- Notificación de Ruleta del Tigre comprada esta ronda ---
-        ruletas = c.execute("SELECT username, meta FROM purchases WHERE round_id=? AND item='Ruleta del Tigre'", (round_id,)).fetchall()
-        if ruletas:
-            st.subheader("Ruletas del Tigre compradas")
-            for u, meta in ruletas:
-                rival1, rival2 = (meta or "|").split("|")
-                st.write(f"**{u}** retó a **{rival1}** y **{rival2}**")
-        st.markdown("---")
-        # Cambiar título principal
-        st.subheader("Editar título de la temporada")
-        new_title = st.text_input("Nuevo título", get_setting("titulo"))
-        if st.button("Actualizar título"):
-            set_setting("titulo", new_title.strip() or get_setting("titulo"))
-            st.success("Título actualizado – recarga para ver el cambio")
-        # Añadir jugador
-        st.subheader("Añadir nuevo jugador")
-        new_user = st.text_input("Usuario nuevo")
-        new_pass = st.text_input("Contraseña nueva")
-        new_role = st.selectbox("Rol", ["jugador", "juez"])
-        if st.button("Crear jugador"):
-            if new_user in users:
-                st.error("El usuario ya existe")
-            elif not new_user or not new_pass:
-                st.error("Usuario y contraseña obligatorios")
-            else:
-                c.execute("INSERT INTO users VALUES(?,?,?,?,?,?)", (new_user, new_pass, new_role, 0, 0, 1))
+def view_admin():
+    st.header("Panel Admin")
+    # --- Notificación de Ruleta del Tigre comprada esta ronda ---
+    ruletas = [(u, meta) for u, (itm, meta) in ronda["compras"].items() if itm == "Ruleta del Tigre"]
+    if ruletas:
+        st.subheader("Ruletas del Tigre compradas")
+        for u, meta in ruletas:
+            rival1, rival2 = (meta or "|").split("|")
+            st.write(f"**{u}** retó a **{rival1}** y **{rival2}**")
+    # --- Frases de esta ronda que repiten una de rondas anteriores ---
+    repetidas = reads.get(ver[cache.round_key(round_id)], search.repeated, pool, round_id)
+    if repetidas:
+        st.subheader("Frases repetidas de rondas anteriores")
+        for texto, autor, numero, original in repetidas:
+            st.write(f"**{autor}**: «{texto}» (ya la envió {original} en la ronda {numero})")
+    st.markdown("---")
+    # Cambiar título principal
+    st.subheader("Editar título de la temporada")
+    new_title = st.text_input("Nuevo título", get_setting("titulo"))
+    if st.button("Actualizar título"):
+        set_setting("titulo", new_title.strip() or get_setting("titulo"))
+        st.success("Título actualizado – recarga para ver el cambio")
+    # Añadir jugador
+    st.subheader("Añadir nuevo jugador")
+    new_user = st.text_input("Usuario nuevo")
+    new_pass = st.text_input("Contraseña nueva")
+    new_role = st.selectbox("Rol", ["jugador", "juez"])
+    if st.button("Crear jugador"):
+        if new_user in users:
+            st.error("El usuario ya existe")
+        elif not new_user or not new_pass:
+            st.error("Usuario y contraseña obligatorios")
+        else:
+            with store.tx():
+                store.add_user(new_user, new_pass, new_role)
                 # también agregar a ronda actual
-                c.execute("INSERT INTO player_round(round_id, username, responses_left) VALUES(?,?,1)", (round_id, new_user))
-                conn.commit(); st.success("Jugador añadido"); st.rerun()
-
-        st.markdown("---")
-        # Desactivar / habilitar
-        colA, colB = st.columns(2)
-        with colA:
-            des = st.selectbox("Desactivar", [u for u in users if users[u][5] == 1])
-            if st.button("Desactivar"):
-                c.execute("UPDATE users SET active=0 WHERE username=?", (des,))
-                conn.commit(); st.success("Desactivado"); st.rerun()
-        with colB:
-            reh = st.selectbox("Rehabilitar", [u for u in users if users[u][5] == 0])
-            if st.button("Rehabilitar"):
-                c.execute("UPDATE users SET active=1 WHERE username=?", (reh,))
+                store.add_player(round_id, new_user)
+            st.success("Jugador añadido"); st.rerun()
+
+    st.markdown("---")
+    # Desactivar / habilitar
+    colA, colB = st.columns(2)
+    with colA:
+        des = st.selectbox("Desactivar", users.names(active=1))
+        if st.button("Desactivar"):
+            store.set_active(des, 0)
+            st.success("Desactivado"); st.rerun()
+    with colB:
+        reh = st.selectbox("Rehabilitar", users.names(active=0))
+        if st.button("Rehabilitar"):
+            with store.tx():
+                store.set_active(reh, 1)
                 # añadir al player_round si no existe para ronda actual
-                if not c.execute("SELECT 1 FROM player_round WHERE round_id=? AND username=?", (round_id, reh)).fetchone():
-                    c.execute("INSERT INTO player_round(round_id, username, responses_left) VALUES(?,?,1)", (round_id, reh))
-                conn.commit(); st.success("Rehabilitado"); st.rerun()
-
-        st.markdown("---")
-        # Recompensas configurables
-        col1, col2, col3, col4 = st.columns(4)
-        r1 = col1.number_input("1º", value=int(get_setting("reward_first")))
-        r2 = col2.number_input("2º", value=int(get_setting("reward_second")))
-        r3 = col3.number_input("3º", value=int(get_setting("reward_third")))
-        r45 = col4.number_input("4º-5º", value=int(get_setting("reward_45")))
-        if st.button("Guardar recompensas"):
+                store.add_player(round_id, reh)
+            st.success("Rehabilitado"); st.rerun()
+
+    st.markdown("---")
+    # Recompensas configurables
+    col1, col2, col3, col4 = st.columns(4)
+    r1 = col1.number_input("1º", value=get_setting("reward_first"))
+    r2 = col2.number_input("2º", value=get_setting("reward_second"))
+    r3 = col3.number_input("3º", value=get_setting("reward_third"))
+    r45 = col4.number_input("4º-5º", value=get_setting("reward_45"))
+    if st.button("Guardar recompensas"):
+        with pool.tx():
             set_setting("reward_first", r1); set_setting("reward_second", r2); set_setting("reward_third", r3); set_setting("reward_45", r45)
-            st.success("Recompensas guardadas")
-
-        st.markdown("---")
-        # Ajustar monedas, penalización y respuestas
-        st.subheader("Ajustar parámetros de jugador")
-        sel_user = st.selectbox("Jugador", list(users.keys()))
-        delta_coins = st.number_input("± Monedas", value=0, step=1, format="%d")
-        delta_pen  = st.number_input("± Penalización de puntos", value=0, step=1, format="%d")
-        delta_resp = st.number_input("± Respuestas restantes", value=0, step=1, format="%d")
-        if st.button("Aplicar ajustes"):
-            if delta_coins:
-                c.execute("UPDATE users SET coins = coins + ? WHERE username=?", (delta_coins, sel_user))
-            if delta_pen:
-                c.execute("UPDATE player_round SET penalty = penalty + ? WHERE round_id=? AND username=?", (delta_pen, round_id, sel_user))
-            if delta_resp:
-                c.execute("UPDATE player_round SET responses_left = responses_left + ? WHERE round_id=? AND username=?", (delta_resp, round_id, sel_user))
-            conn.commit(); st.success("Ajustes aplicados"); st.rerun()
-
-        st.markdown("---")
-        # --- Reinicio TOTAL de la base de datos ---
-        st.subheader("Reiniciar base de datos")
-        confirm = st.checkbox("⚠️ Confirmo reinicio completo (esto borra TODO)")
-        if st.button("Ejecutar reinicio"):
-            if confirm:
-                tables = ["frases", "votos", "rounds", "purchases", "player_round", "users"]
+        st.success("Recompensas guardadas")
+    colL, colK = st.columns(2)
+    live_s = colL.number_input("Refresco en vivo (segundos, 0 = manual)", min_value=0, value=get_setting("live_interval"))
+    top_k = colK.number_input("Frases por papeleta (top K, 0 = todas)", min_value=0, value=get_setting("ballot_top_k"))
+    if st.button("Guardar ajustes de ronda"):
+        with pool.tx():
+            set_setting("live_interval", live_s); set_setting("ballot_top_k", top_k)
+        st.success("Ajustes guardados (el refresco se aplica en la próxima recarga de cada sesión)")
+
+    st.markdown("---")
+    # Ajustar monedas, penalización y respuestas
+    st.subheader("Ajustar parámetros de jugador")
+    sel_user = st.selectbox("Jugador", list(users))
+    delta_coins = st.number_input("± Monedas", value=0, step=1, format="%d")
+    delta_pen  = st.number_input("± Penalización de puntos", value=0, step=1, format="%d")
+    delta_resp = st.number_input("± Respuestas restantes", value=0, step=1, format="%d")
+    if st.button("Aplicar ajustes"):
+        with store.tx():
+            store.add_coins([(sel_user, round_id, delta_coins, ledger.AJUSTE)])
+            if delta_pen or delta_resp:
+                store.adjust_player(round_id, sel_user, responses=delta_resp, penalty=delta_pen)
+        st.success("Ajustes aplicados"); st.rerun()
+
+    st.markdown("---")
+    # --- Reinicio TOTAL de la base de datos ---
+    st.subheader("Reiniciar base de datos")
+    confirm = st.checkbox("⚠️ Confirmo reinicio completo (esto borra TODO)")
+    if st.button("Ejecutar reinicio"):
+        if confirm:
+            tables = ["frases", "votos", "rounds", "purchases", "player_round", "round_results", "ballots",
+                      "balance_snapshots", "coin_ledger", "users"]
+            with pool.tx() as c:
                 for tbl in tables:
-                    if tbl == "users":
-                        c.execute("DELETE FROM users WHERE username <> 'Jlarriva'")
+                    if tbl in ("users", "coin_ledger"):
+                        # el admin conserva su saldo, y con él sus apuntes
+                        c.execute(f"DELETE FROM {tbl} WHERE username <> 'Jlarriva'")
                     else:
                         c.execute(f"DELETE FROM {tbl}")
                 set_setting("current_round", 1)
                 # crear ronda 1 y reiniciar ajustes temporales
-                c.execute("INSERT INTO rounds(numero,status,created_at) VALUES(1,'open',?)", (dt.datetime.utcnow().isoformat(),))
-                new_rid = c.lastrowid
+                new_rid = c.execute("INSERT INTO rounds(numero,status,created_at) VALUES(1,'open',?)", (dt.datetime.utcnow().isoformat(),)).lastrowid
                 c.execute("INSERT INTO player_round(round_id, username, responses_left) VALUES(?,?,1)", (new_rid, 'Jlarriva'))
-                conn.commit()
-                st.success("Base reiniciada. Solo la cuenta admin permanece. Recarga la página.")
-                st.rerun()
-            else:
-                st.error("Marca la casilla de confirmación primero.")
-        st.markdown("---")
-        # Cerrar ronda
-        if st.button("Cerrar ronda y otorgar premios"):
-            frases = c.execute("SELECT id, autor FROM frases WHERE round_id=?", (round_id,)).fetchall()
-            if not frases:
-                st.error("Sin frases para esta ronda")
-            else:
-                N = len(frases)
-                pts = {a: 0 for _, a in frases}
-                for fid, pos in c.execute("SELECT frase_id, posicion FROM votos WHERE frase_id IN (SELECT id FROM frases WHERE round_id=? )", (round_id,)):
-                    aut = c.execute("SELECT autor FROM frases WHERE id=?", (fid,)).fetchone()[0]
-                    pts[aut] += N + 1 - pos
-                ord_list = sorted(pts, key=pts.get, reverse=True)
-                rewards = [
-                    int(get_setting("reward_first")),
-                    int(get_setting("reward_second")),
-                    int(get_setting("reward_third")),
-                    int(get_setting("reward_45")),
-                    int(get_setting("reward_45"))
-                ]
-                for idx, pl in enumerate(ord_list):
-                    reward = rewards[idx] if idx < len(rewards) else int(get_setting("reward_participate"))
-                    mult = c.execute("SELECT multiplier FROM player_round WHERE round_id=? AND username=?", (round_id, pl)).fetchone()[0]
-                    c.execute("UPDATE users SET coins = coins + ? WHERE username=?", (reward * mult, pl))
-                best_pos = {}
-                for idx, au in enumerate(ord_list):
-                    if au not in best_pos:
-                        best_pos[au] = idx
-                eliminado = sorted(best_pos.items(), key=lambda x: x[1])[-1][0]
-                c.execute("UPDATE users SET active=0 WHERE username=?", (eliminado,))
-                c.execute("UPDATE rounds SET status='closed' WHERE id=?", (round_id,))
-                next_num = current_round + 1
-                set_setting("current_round", next_num)
-                c.execute("INSERT INTO rounds(numero,status,created_at) VALUES(?,?,?)", (next_num, 'open', dt.datetime.utcnow().isoformat()))
-                new_rid = c.lastrowid
-                activos = c.execute("SELECT username FROM users WHERE active=1").fetchall()
-                c.executemany("INSERT INTO player_round(round_id, username, responses_left) VALUES(?,?,1)", [(new_rid, a[0]) for a in activos])
-                conn.commit()
-                st.success(f"Ronda cerrada. Eliminado: {eliminado}. Ronda {next_num} abierta.")
-                st.rerun()
+            st.success("Base reiniciada. Solo la cuenta admin permanece. Recarga la página.")
+            st.rerun()
+        else:
+            st.error("Marca la casilla de confirmación primero.")
+    st.markdown("---")
+    # Cerrar ronda
+    if st.button("Cerrar ronda y otorgar premios"):
+        closed = rounds.close_round(pool, cfg, round_id)
+        if not closed:
+            st.error("Sin frases para esta ronda (o ya estaba cerrada)")
+        else:
+            st.success(f"Ronda cerrada. Eliminado: {closed['eliminado']}. Ronda {closed['numero'] + 1} abierta.")
+            st.rerun()
+
+    st.markdown("---")
+    # --- Rendimiento: trazas de SQL y tiempos de render ---
+    st.subheader("Rendimiento")
+    on = st.toggle("Instrumentación activa", value=perf.enabled())
+    if on != perf.enabled():
+        perf.enable(pool) if on else perf.disable()
+        st.rerun()
+    cstats = reads.stats()
+    st.caption(f"Caché de lecturas: {cstats['entries']} entradas, {cstats['bytes'] // 1024} KB, "
+               f"{cstats['hits']} aciertos / {cstats['misses']} fallos")
+    snap = perf.snapshot()
+    if snap["reruns"]:
+        lat = np.array([r["total_ms"] for r in snap["reruns"]])
+        qs = np.array([r["queries"] for r in snap["reruns"]])
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Reruns registrados", len(lat))
+        m2.metric("Latencia p50 / p95 (ms)", f"{np.percentile(lat, 50):.0f} / {np.percentile(lat, 95):.0f}")
+        m3.metric("Consultas por rerun (media)", f"{qs.mean():.1f}")
+        counts, edges = np.histogram(lat, bins=min(20, max(1, len(lat))))
+        st.caption("Histograma de latencia por rerun (ms)")
+        st.bar_chart({"ms": np.round(edges[:-1], 1), "reruns": counts}, x="ms", y="reruns")
+        secciones = {}
+        for r in snap["reruns"]:
+            for name, ms in r["sections"].items():
+                secciones.setdefault(name, []).append(ms)
+        st.caption("Tiempo por sección (ms)")
+        st.table([{"Sección": k, "Media": round(float(np.mean(v)), 1), "p95": round(float(np.percentile(v, 95)), 1), "Reruns": len(v)}
+                  for k, v in sorted(secciones.items())])
+    if snap["slowest"]:
+        st.caption("Sentencias más lentas")
+        st.table(snap["slowest"][:10])
+        st.caption("Consultas por forma (tiempo total)")
+        st.table(snap["shapes"][:15])
+    colX, colY = st.columns(2)
+    colX.download_button("Exportar JSON", perf.export(), file_name="twowte_perf.json", mime="application/json")
+    if colY.button("Vaciar trazas"):
+        perf.reset()
+        st.rerun()
+
+
+# ---------- 8. Vista seleccionada --------------------------------------------
+# Sólo se ejecuta (y consulta) la vista elegida; las demás no cuestan nada.
+VIEWS = {"Acción": view_accion, "Tienda": view_tienda, "Resultados": view_resultados, "Historial": view_historial}
+if is_admin:
+    VIEWS["Admin"] = view_admin
+if st.session_state.get("view") not in VIEWS:
+    st.session_state["view"] = "Acción"
+view = st.radio("Vista", list(VIEWS), horizontal=True, key="view", label_visibility="collapsed")
+with perf.section(view):
+    VIEWS[view]()
+
+perf.end_rerun()
@@ -0,0 +1,182 @@
+# Archivo de temporadas
+# =============================================================================
+# Saca de game.db las rondas cerradas a un fichero JSONL comprimido con gzip y
+# luego borra de las tablas calientes (frases, votos, papeletas, compras y
+# player_round) las filas archivadas. Rondas, clasificación, libro de monedas
+# y saldos se quedan: son pequeños y los leen Historial y Resultados. El libro
+# se archiva completo, para que cuadre con el saldo actual de los usuarios.
+#
+# Formato: una línea JSON por fila, {"t": tabla, "r": [valores]}, precedidas
+# de una cabecera {"t": "meta", ...} con las columnas de cada tabla. Todo va
+# por lotes de BATCH filas (fetchmany / executemany), así que la memoria no
+# depende del tamaño de la temporada. Las contraseñas no se archivan.
+#
+#   python archive.py export game.db temporada1.jsonl.gz --keep-last 1
+#   python archive.py import temporada1.jsonl.gz revision.db
+# =============================================================================
+import argparse
+import datetime as dt
+import gzip
+import json
+import os
+import secrets
+import sys
+
+import db
+import schema
+
+FORMAT = 1
+BATCH = 1000
+
+# tabla -> condición sobre las rondas archivadas (:ids es una lista JSON)
+_IN = "IN (SELECT value FROM json_each(:ids))"
+TABLES = {
+    "rounds": f"id {_IN}",
+    "frases": f"round_id {_IN}",
+    "votos": f"frase_id IN (SELECT id FROM frases WHERE round_id {_IN})",
+    "ballots": f"round_id {_IN}",
+    "purchases": f"round_id {_IN}",
+    "player_round": f"round_id {_IN}",
+    "round_results": f"round_id {_IN}",
+    # el libro va entero (saldo inicial y rondas posteriores incluidos): users
+    # se exporta con su saldo actual y ledger.audit() debe cuadrar al importar
+    "coin_ledger": "1",
+    "balance_snapshots": f"round_id {_IN}",
+}
+# se borran de la base en este orden (votos antes que las frases que los ubican)
+PRUNE = ["votos", "ballots", "purchases", "player_round", "frases"]
+USER_COLUMNS = ["username", "role", "is_admin", "coins", "active"]
+
+
+def archivable(pool, keep_last=1):
+    """Ids de las rondas cerradas que aún tienen frases, salvo las keep_last más recientes."""
+    rows = pool.fetchall("""
+        SELECT r.id FROM rounds r
+        WHERE r.status='closed' AND EXISTS (SELECT 1 FROM frases f WHERE f.round_id = r.id)
+        ORDER BY r.numero""")
+    ids = [r[0] for r in rows]
+    return ids[:max(0, len(ids) - keep_last)]
+
+
+def export_season(pool, dest, keep_last=1, prune=True):
+    """Escribe el archivo y, si prune, borra lo archivado. Devuelve {tabla: filas}."""
+    ids = archivable(pool, keep_last)
+    counts = {}
+    if not ids:
+        return counts
+    args = {"ids": json.dumps(ids)}
+    tmp = dest + ".tmp"
+    with pool.connection() as c:
+        # una sola transacción de lectura: el archivo es una foto coherente
+        c.execute("BEGIN")
+        try:
+            columns = {t: [d[0] for d in c.execute(f"SELECT * FROM {t} LIMIT 0").description] for t in TABLES}
+            columns["users"] = USER_COLUMNS
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                meta = {"t": "meta", "format": FORMAT, "created_at": dt.datetime.utcnow().isoformat(),
+                        "rounds": ids, "columns": columns}
+                f.write(json.dumps(meta, ensure_ascii=False) + "\n")
+                queries = [("users", f"SELECT {', '.join(USER_COLUMNS)} FROM users", {})]
+                queries += [(t, f"SELECT * FROM {t} WHERE {cond}", args) for t, cond in TABLES.items()]
+                for t, sql, a in queries:
+                    cur = c.execute(sql, a)
+                    n = 0
+                    while True:
+                        rows = cur.fetchmany(BATCH)
+                        if not rows:
+                            break
+                        f.writelines(json.dumps({"t": t, "r": list(r)}, ensure_ascii=False) + "\n" for r in rows)
+                        n += len(rows)
+                    counts[t] = n
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        finally:
+            c.execute("COMMIT")
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, dest)
+    if prune:
+        with pool.tx() as c:
+            for t in PRUNE:
+                c.execute(f"DELETE FROM {t} WHERE {TABLES[t]}", args)
+    return counts
+
+
+def restore(src, pool, password=None):
+    """Carga un archivo en una base sin rondas. Devuelve ({tabla: filas}, contraseña de los usuarios).
+
+    Los usuarios no traen contraseña: todos reciben la dada (o una aleatoria).
+    """
+    password = password or secrets.token_urlsafe(9)
+    counts = {}
+    with gzip.open(src, "rt", encoding="utf-8") as f, pool.tx() as c:
+        if c.execute("SELECT 1 FROM rounds LIMIT 1").fetchone():
+            raise ValueError("la base de destino ya tiene rondas: importa en una base nueva")
+        meta = json.loads(f.readline())
+        if meta.get("t") != "meta" or meta.get("format") != FORMAT:
+            raise ValueError("no es un archivo de temporada reconocido")
+        columns = dict(meta["columns"])
+        columns["users"] = USER_COLUMNS + ["password"]
+        batch, table = [], None
+
+        def flush():
+            if batch:
+                cols = columns[table]
+                c.executemany(f"INSERT OR REPLACE INTO {table}({', '.join(cols)}) VALUES({', '.join('?' * len(cols))})", batch)
+                counts[table] = counts.get(table, 0) + len(batch)
+                batch.clear()
+
+        for line in f:
+            rec = json.loads(line)
+            if rec["t"] != table or len(batch) >= BATCH:
+                flush()
+                table = rec["t"]
+            batch.append(rec["r"] + [password] if table == "users" else rec["r"])
+        flush()
+        # la siguiente ronda que se abra continúa la numeración archivada
+        last = c.execute("SELECT MAX(numero) FROM rounds").fetchone()[0]
+        if last is not None:
+            c.execute("REPLACE INTO settings VALUES('current_round', ?)", (str(last + 1),))
+    return counts, password
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Archivo de temporadas de TWOWTE")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("export", help="archiva las rondas cerradas y las borra de la base")
+    p.add_argument("db")
+    p.add_argument("dest")
+    p.add_argument("--keep-last", type=int, default=1, help="rondas cerradas recientes que se quedan en la base")
+    p.add_argument("--no-prune", action="store_true", help="sólo escribir el archivo")
+    p.add_argument("--vacuum", action="store_true", help="compactar la base tras borrar")
+    p = sub.add_parser("import", help="restaura un archivo en una base nueva")
+    p.add_argument("src")
+    p.add_argument("db")
+    p.add_argument("--password", default=None, help="contraseña para todos los usuarios importados")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "export":
+        pool = db.get_pool(args.db)
+        schema.migrate(pool)
+        counts = export_season(pool, args.dest, args.keep_last, prune=not args.no_prune)
+        if not counts:
+            print("No hay rondas cerradas que archivar")
+            return
+        if args.vacuum and not args.no_prune:
+            with pool.connection() as c:
+                c.execute("VACUUM")
+        print(f"Archivado en {args.dest}: " + ", ".join(f"{t} {n}" for t, n in counts.items()))
+    else:
+        if os.path.exists(args.db) and os.path.getsize(args.db):
+            print(f"Aviso: {args.db} ya existe; sólo se importa si no tiene rondas")
+        pool = db.get_pool(args.db)
+        schema.migrate(pool)
+        counts, password = restore(args.src, pool, args.password)
+        print(f"Importado en {args.db}: " + ", ".join(f"{t} {n}" for t, n in counts.items()))
+        print(f"Contraseña de los usuarios importados: {password}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
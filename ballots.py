@@ -0,0 +1,41 @@
+# Papeletas de los jueces
+# =============================================================================
+# Un voto se guarda entero o no se guarda: las posiciones van en un único
+# executemany dentro de la transacción, junto con la fila de la papeleta
+# (juez, ronda, hora, nº de frases). Así "¿ya votó este juez?" y "¿cuántos
+# jueces han votado?" se responden con la clave primaria de ballots.
+# =============================================================================
+import datetime as dt
+import json
+
+_IN = "IN (SELECT value FROM json_each(?))"
+
+
+def submit_ballot(c, juez, round_id, frase_ids):
+    """Sustituye la papeleta del juez en la ronda. Debe llamarse dentro de pool.tx().
+
+    Devuelve False (y no escribe nada) si la ronda no existe o ya no está
+    abierta, o si frase_ids repite una frase o incluye alguna de otra ronda.
+    """
+    status = c.execute("SELECT status FROM rounds WHERE id=?", (round_id,)).fetchone()
+    if not status or status[0] != 'open':
+        return False
+    if len(set(frase_ids)) != len(frase_ids):
+        return False
+    if frase_ids and c.execute(f"SELECT COUNT(*) FROM frases WHERE round_id=? AND id {_IN}",
+                               (round_id, json.dumps(list(frase_ids)))).fetchone()[0] != len(frase_ids):
+        return False
+    c.execute("DELETE FROM votos WHERE juez=? AND frase_id IN (SELECT id FROM frases WHERE round_id=? )", (juez, round_id))
+    c.executemany("INSERT INTO votos(juez, frase_id, posicion) VALUES(?,?,?)",
+                  [(juez, fid, pos) for pos, fid in enumerate(frase_ids, 1)])
+    c.execute("REPLACE INTO ballots(round_id, juez, submitted_at, n_frases) VALUES(?,?,?,?)",
+              (round_id, juez, dt.datetime.utcnow().isoformat(), len(frase_ids)))
+    return True
+
+
+def has_voted(pool, juez, round_id):
+    return pool.fetchone("SELECT 1 FROM ballots WHERE round_id=? AND juez=?", (round_id, juez)) is not None
+
+
+def judges_voted(pool, round_id):
+    return pool.fetchone("SELECT COUNT(*) FROM ballots WHERE round_id=?", (round_id,))[0]
@@ -0,0 +1,493 @@
+# Benchmarks y pruebas de carga sin navegador
+# =============================================================================
+# Genera temporadas sintéticas de game.db y ejecuta app.py con
+# streamlit.testing.v1.AppTest como cada rol, midiendo por rerun:
+#   • latencia (p50/p95/p99), • nº de sentencias SQL, • pico de memoria,
+# en cada pestaña (Acción, Tienda, Resultados, Historial y, para admin, Admin).
+# Los resultados se pueden guardar como baseline y comparar después.
+#
+#   python bench.py run --players 30 --judges 5 --rounds 20
+#   python bench.py run --save-baseline          # escribe bench_baseline.json
+#   python bench.py run --compare                # compara contra el baseline
+#   python bench.py run --view Tienda            # sólo una pestaña
+#   python bench.py concurrent --sessions 40     # sesiones simultáneas
+#   python bench.py contention --engine shared   # conexión compartida vs pool
+#   python bench.py scoring --rounds 2000        # orden de score_round vs el original
+# =============================================================================
+import argparse
+import json
+import os
+import queue
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+import ballots
+import db
+import ledger
+import rounds
+import schema
+import scoring
+import settings
+import shop
+import textnorm
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "app.py")
+BASELINE = os.path.join(HERE, "bench_baseline.json")
+VIEWS = ("Acción", "Tienda", "Resultados", "Historial", "Admin")
+ADMIN = ("Jlarriva", "FioreIsQueen", "juez", 1, 0, 1)
+ITEMS = ["Doble Respuesta", "Triple Respuesta", "Desempate Favorable", "Duplicador de Monedas"]
+
+
+# ---------- Generación de temporadas ----------------------------------------
+def generate_season(path, players=30, judges=5, n_rounds=20, phrases=1, purchase_rate=0.3, seed=0, top_k=0):
+    """Crea una temporada con n_rounds rondas cerradas y una abierta con frases enviadas.
+
+    Las rondas se juegan con las reglas reales (ballots.submit_ballot y
+    rounds.close_round), así que premios, eliminaciones y clasificación son
+    los mismos que produciría la app. Con top_k > 0 las papeletas son parciales.
+    """
+    rng = random.Random(seed)
+    pool = db.Pool(path)
+    schema.migrate(pool)
+    with pool.tx() as c:
+        c.execute("INSERT INTO users VALUES(?,?,?,?,?,?)", ADMIN)
+        c.executemany("INSERT INTO users VALUES(?,?,?,?,?,?)",
+                      [(f"jugador{i:03d}", "x", "jugador", 0, 0, 1) for i in range(players)] +
+                      [(f"juez{i:02d}", "x", "juez", 0, 0, 1) for i in range(judges)])
+        ledger.apply(c, [(f"jugador{i:03d}", None, 50, "saldo inicial") for i in range(players)])
+        c.executemany("INSERT OR IGNORE INTO settings VALUES(?,?)", settings.DEFAULTS.items())
+    cfg = settings.Settings(pool)
+    jueces = ["Jlarriva"] + [f"juez{i:02d}" for i in range(judges)]
+
+    for r in range(n_rounds + 1):
+        rid, _ = rounds.open_round(pool, cfg)
+        activos = [u for (u,) in pool.fetchall("SELECT username FROM users WHERE active=1 AND role='jugador'")]
+        if len(activos) < 2:
+            break
+        with pool.tx() as c:
+            for u in activos:
+                extra = 0
+                if rng.random() < purchase_rate:
+                    itm = rng.choice(ITEMS)
+                    c.execute("INSERT INTO purchases(round_id, username, item) VALUES(?,?,?)", (rid, u, itm))
+                    extra = shop.EXTRA_RESPONSES.get(itm, 0)
+                    if itm == "Desempate Favorable":
+                        c.execute("UPDATE player_round SET df_flag=1 WHERE round_id=? AND username=?", (rid, u))
+                    elif itm == "Duplicador de Monedas":
+                        c.execute("UPDATE player_round SET multiplier=2 WHERE round_id=? AND username=?", (rid, u))
+                c.executemany("INSERT INTO frases(texto, autor, round_id) VALUES(?,?,?)",
+                              [(f"r{r} {u} frase {k} #{rng.random():.6f}", u, rid) for k in range(phrases + extra)])
+        if r == n_rounds:
+            break  # la última ronda queda abierta, con frases y sin votos
+        ids = [f for (f,) in pool.fetchall("SELECT id FROM frases WHERE round_id=?", (rid,))]
+        for j in jueces:
+            rng.shuffle(ids)
+            with pool.tx() as c:
+                ballots.submit_ballot(c, j, rid, ids[:top_k] if top_k else list(ids))
+        rounds.close_round(pool, cfg, rid)
+    pool.close()
+    return path
+
+
+# ---------- Medición --------------------------------------------------------
+class SQLCounter:
+    def __init__(self):
+        self.n = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, sql):
+        with self._lock:
+            self.n += 1
+
+
+def _pct(xs, q):
+    xs = sorted(xs)
+    if not xs:
+        return 0.0
+    k = min(len(xs) - 1, max(0, int(round(q / 100 * (len(xs) - 1)))))
+    return xs[k]
+
+
+def _summary(lat_ms, sql, peak_kb):
+    return {
+        "reruns": len(lat_ms),
+        "p50_ms": round(_pct(lat_ms, 50), 2),
+        "p95_ms": round(_pct(lat_ms, 95), 2),
+        "p99_ms": round(_pct(lat_ms, 99), 2),
+        "mean_ms": round(statistics.fmean(lat_ms), 2) if lat_ms else 0.0,
+        "sql_per_rerun": round(sum(sql) / len(sql), 1) if sql else 0.0,
+        "peak_kb": round(peak_kb, 1),
+    }
+
+
+def _apptest(user, is_admin, view=None):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.session_state["user"] = user
+    at.session_state["is_admin"] = is_admin
+    if view:
+        at.session_state["view"] = view
+    return at
+
+
+def _role_users(path):
+    conn = sqlite3.connect(path)
+    jugador = conn.execute("SELECT username FROM users WHERE role='jugador' AND active=1 ORDER BY username LIMIT 1").fetchone()
+    juez = conn.execute("SELECT username FROM users WHERE role='juez' AND is_admin=0 ORDER BY username LIMIT 1").fetchone()
+    conn.close()
+    out = {"admin": ("Jlarriva", True)}
+    if jugador:
+        out["jugador"] = (jugador[0], False)
+    if juez:
+        out["juez"] = (juez[0], False)
+    return out
+
+
+def measure_role(path, user, is_admin, reruns, view=None):
+    pool = db.get_pool(path)
+    counter = SQLCounter()
+    at = _apptest(user, is_admin, view)
+    at.run()  # calentamiento: bootstrap, migraciones y compilación del script
+    lat, sql = [], []
+    pool.set_trace(counter)
+    try:
+        for _ in range(reruns):
+            before = counter.n
+            t0 = time.perf_counter()
+            at.run()
+            lat.append((time.perf_counter() - t0) * 1000)
+            sql.append(counter.n - before)
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+    finally:
+        pool.set_trace(None)
+    # la memoria se mide aparte: tracemalloc ralentiza mucho y falsearía la latencia
+    tracemalloc.start()
+    try:
+        for _ in range(min(reruns, 3)):
+            at.run()
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+    return _summary(lat, sql, peak)
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="twowte-bench-")
+    path = os.path.join(workdir, "game.db")
+    t0 = time.perf_counter()
+    generate_season(path, args.players, args.judges, args.rounds, args.phrases, args.purchase_rate, args.seed, args.top_k)
+    gen_s = time.perf_counter() - t0
+    os.environ["TWOWTE_DB"] = path
+    views = [args.view] if args.view else list(VIEWS)
+    results = {"config": {k: getattr(args, k) for k in ("players", "judges", "rounds", "phrases", "purchase_rate", "seed", "reruns")},
+               "generate_s": round(gen_s, 2), "views": {}}
+    if args.top_k:
+        results["config"]["top_k"] = args.top_k
+    results["config"]["views"] = views
+    users = _role_users(path)
+    for view in views:
+        results["views"][view] = {}
+        for role, (user, is_admin) in users.items():
+            if view == "Admin" and not is_admin:
+                continue  # sin permiso la app cae en Acción, que ya se mide
+            results["views"][view][role] = measure_role(path, user, is_admin, args.reruns, view)
+    _print(results)
+    if args.save_baseline:
+        with open(BASELINE, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Baseline guardado en {BASELINE}")
+    if args.compare:
+        _compare(results)
+
+
+def _print(results):
+    print(f"Temporada generada en {results['generate_s']} s  {results['config']}")
+    print(f"{'vista':<12}{'rol':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'SQL/rerun':>12}{'pico KB':>12}")
+    for view, roles in results["views"].items():
+        for role, r in roles.items():
+            print(f"{view:<12}{role:<10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['sql_per_rerun']:>12}{r['peak_kb']:>12}")
+
+
+def _compare(results):
+    if not os.path.exists(BASELINE):
+        print("No hay baseline: ejecuta antes con --save-baseline")
+        return
+    with open(BASELINE) as f:
+        base = json.load(f)
+    if base.get("config") != results["config"]:
+        print("Aviso: el baseline se tomó con otra configuración", base.get("config"))
+    print(f"{'vista':<12}{'rol':<10}{'métrica':<16}{'baseline':>12}{'actual':>12}{'cambio':>10}")
+    for view, roles in results["views"].items():
+        for role, r in roles.items():
+            b = base.get("views", {}).get(view, {}).get(role)
+            if not b:
+                continue
+            for k in ("p50_ms", "p95_ms", "sql_per_rerun", "peak_kb"):
+                delta = (r[k] - b[k]) / b[k] * 100 if b[k] else 0.0
+                print(f"{view:<12}{role:<10}{k:<16}{b[k]:>12}{r[k]:>12}{delta:>+9.1f}%")
+
+
+# ---------- Sesiones concurrentes -------------------------------------------
+def _session_worker(job):
+    """Una sesión en su propio proceso (AppTest no admite varias por proceso a la vez)."""
+    path, user, is_admin, reruns, write_rate, start_at, seed = job
+    os.environ["TWOWTE_DB"] = path
+    rng = random.Random(seed)
+    pool = db.get_pool(path)
+    round_id = pool.fetchone("SELECT id FROM rounds WHERE status='open'")[0]
+    jugadores = [u for (u,) in pool.fetchall("SELECT username FROM users WHERE role='jugador' AND active=1")]
+    at = _apptest(user, is_admin)
+    at.run()  # calentamiento fuera de la medición
+    lat, wlat, errors = [], [], []
+    time.sleep(max(0.0, start_at - time.time()))
+    for k in range(reruns):
+        try:
+            if rng.random() < write_rate:
+                # escritura corta como la de "Enviar frase"
+                t0 = time.perf_counter()
+                with pool.tx() as c:
+                    c.execute("INSERT INTO frases(texto, autor, round_id) VALUES(?,?,?)",
+                              (f"carga {seed}-{k}", rng.choice(jugadores), round_id))
+                wlat.append((time.perf_counter() - t0) * 1000)
+            t0 = time.perf_counter()
+            at.run()
+            lat.append((time.perf_counter() - t0) * 1000)
+            if at.exception:
+                errors.append(str(at.exception[0].value))
+        except sqlite3.Error as e:
+            errors.append(repr(e))
+    return lat, wlat, errors
+
+
+def concurrent(args):
+    """Muchas sesiones a la vez (un proceso por sesión) sobre la misma base.
+
+    Mezcla reruns completos con escrituras reales y cuenta los errores de
+    SQLite (p. ej. "database is locked").
+    """
+    import multiprocessing
+    workdir = tempfile.mkdtemp(prefix="twowte-bench-")
+    path = os.path.join(workdir, "game.db")
+    generate_season(path, args.players, args.judges, args.rounds, 1, 0.3, args.seed, args.top_k)
+    roles = list(_role_users(path).values())
+    rng = random.Random(args.seed)
+    start_at = time.time() + 5 + args.sessions * 0.1  # todos arrancan a la vez tras el calentamiento
+    jobs = [(path, *rng.choice(roles), args.reruns, args.write_rate, start_at, i) for i in range(args.sessions)]
+    with multiprocessing.get_context("spawn").Pool(args.sessions) as mp:
+        out = mp.map(_session_worker, jobs)
+    lat = [x for o in out for x in o[0]]
+    wlat = [x for o in out for x in o[1]]
+    errors = [x for o in out for x in o[2]]
+    _report_contention(f"{args.sessions} sesiones × {args.reruns} reruns", lat, wlat, errors, label="rerun")
+
+
+def _contention_worker(path, engine, sessions, reruns, write_rate, out):
+    if engine == "shared":
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        textnorm.register(conn)
+        c = conn.cursor()
+
+        def read(sql, params):
+            return c.execute(sql, params).fetchall()
+
+        def write(sql, params):
+            c.execute(sql, params)
+            conn.commit()
+    else:
+        pool = db.Pool(path)
+        read = pool.fetchall
+        write = pool.execute
+    round_id = sqlite3.connect(path).execute("SELECT id FROM rounds WHERE status='open'").fetchone()[0]
+
+    lat, wlat, errors = [], [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(sessions)
+
+    def session(i):
+        rng = random.Random(i)
+        barrier.wait()
+        for k in range(reruns):
+            try:
+                t0 = time.perf_counter()
+                # lecturas de un rerun típico (Acción + Resultados + Historial)
+                read("SELECT id, texto FROM frases WHERE round_id=?", (round_id,))
+                read("SELECT COUNT(DISTINCT autor) FROM frases WHERE round_id=?", (round_id,))
+                read("SELECT username, SUM(rank = 1), AVG(rank) FROM round_results GROUP BY username", ())
+                with lock:
+                    lat.append((time.perf_counter() - t0) * 1000)
+                if rng.random() < write_rate:
+                    t0 = time.perf_counter()
+                    write("INSERT INTO frases(texto, autor, round_id) VALUES(?,?,?)", (f"carga {i}-{k}", "jugador000", round_id))
+                    with lock:
+                        wlat.append((time.perf_counter() - t0) * 1000)
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    out.put((lat, wlat, errors))
+
+
+def contention(args):
+    """Carga de lectura/escritura desde muchos hilos: conexión compartida vs pool.
+
+    --engine shared reproduce el esquema anterior (una conexión y un cursor
+    globales para todos los hilos); --engine pool usa db.Pool. La carga corre
+    en un proceso hijo porque con la conexión compartida el intérprete puede
+    llegar a caerse (segfault dentro de sqlite3).
+    """
+    import multiprocessing
+    workdir = tempfile.mkdtemp(prefix="twowte-bench-")
+    path = os.path.join(workdir, "game.db")
+    generate_season(path, args.players, args.judges, args.rounds, 1, 0.3, args.seed, args.top_k)
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_contention_worker, args=(path, args.engine, args.sessions, args.reruns, args.write_rate, out))
+    proc.start()
+    result = None
+    while result is None and (proc.is_alive() or not out.empty()):
+        try:
+            result = out.get(timeout=0.5)  # leer antes de join: la cola no debe llenarse
+        except queue.Empty:
+            pass
+    proc.join()
+    title = f"[{args.engine}] {args.sessions} hilos × {args.reruns} iteraciones"
+    if result is None:
+        print(title)
+        print(f"el proceso de carga terminó con código {proc.exitcode}"
+              + (f" (señal {-proc.exitcode})" if proc.exitcode < 0 else ""))
+        return
+    _report_contention(title, *result)
+
+
+def _report_contention(title, lat, wlat, errors, label="lectura"):
+    locked = sum("locked" in e for e in errors)
+    print(title)
+    if lat:
+        print(f"{label:<9} p50 {_pct(lat, 50):.1f} ms  p95 {_pct(lat, 95):.1f} ms  p99 {_pct(lat, 99):.1f} ms")
+    if wlat:
+        print(f"escritura p50 {_pct(wlat, 50):.1f} ms  p95 {_pct(wlat, 95):.1f} ms  ({len(wlat)} escrituras)")
+    print(f"errores: {len(errors)} (database is locked: {locked})")
+    for e in sorted(set(errors))[:5]:
+        print("  ", e)
+
+
+# ---------- Regresión del recuento ------------------------------------------
+def _reference_order(frases, votos, N):
+    """Orden del recuento original: np.std por frase y sort estable (puntos, DF, STD)."""
+    pos_map = {f[0]: [] for f in frases}
+    pts = {f[0]: 0 for f in frases}
+    for fid, pos in votos:
+        pts[fid] += N + 1 - pos
+        pos_map[fid].append(pos)
+    results = []
+    for fid, _, aut, pen, df in frases:
+        # redondeada: np.std de dos listas con la misma varianza puede diferir en el último bit
+        std = round(float(np.std(pos_map[fid])), 9) if pos_map[fid] else 0.0
+        results.append({"id": fid, "Puntos": pts[fid] + pen, "DF": bool(df), "STD": std})
+    results.sort(key=lambda r: (r["Puntos"], r["DF"], r["STD"]), reverse=True)
+    return [r["id"] for r in results]
+
+
+def scoring_check(args):
+    """Compara el orden de scoring.score_round con el recuento original en rondas aleatorias
+    con penalizaciones y DF. Con --top-k las papeletas son parciales y la referencia
+    rellena las no ordenadas a mano. Sale con 1 si alguna ronda difiere."""
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="twowte-bench-")
+    pool = db.Pool(os.path.join(workdir, "game.db"))
+    schema.migrate(pool)
+    bad = []
+    with pool.tx() as c:
+        for n in range(1, args.rounds + 1):
+            N, B = rng.randint(2, 8), rng.randint(1, 6)
+            rid = c.execute("INSERT INTO rounds(numero,status,created_at) VALUES(?,'closed','')", (n,)).lastrowid
+            frases = []
+            for i in range(N):
+                aut = f"jugador{i:03d}"
+                fid = c.execute("INSERT INTO frases(texto, autor, round_id) VALUES(?,?,?)", (f"r{n} f{i}", aut, rid)).lastrowid
+                pen, df = rng.choice([0, 0, 0, -2, -1, 1, 2]), int(rng.random() < 0.3)
+                c.execute("INSERT INTO player_round(round_id, username, responses_left, df_flag, penalty) VALUES(?,?,0,?,?)",
+                          (rid, aut, df, pen))
+                frases.append((fid, None, aut, pen, df))
+            votos = []
+            K = min(args.top_k, N) if args.top_k else N
+            for j in range(B):
+                ids = [f[0] for f in frases]
+                rng.shuffle(ids)
+                c.executemany("INSERT INTO votos(juez, frase_id, posicion) VALUES(?,?,?)",
+                              [(f"juez{j:02d}", fid, p) for p, fid in enumerate(ids[:K], 1)])
+                # las no ordenadas cuentan en el puesto medio de los libres
+                votos += [(fid, p if p <= K else (K + 1 + N) / 2) for p, fid in enumerate(ids, 1)]
+            ref = _reference_order(frases, votos, N)
+            por_texto = {f"r{n} f{i}": f[0] for i, f in enumerate(frases)}
+            got = [por_texto[r["Frase"]] for r in scoring.score_round(c, rid)["tabla"]]
+            if got != ref:
+                bad.append(n)
+    print(f"{args.rounds} rondas: {len(bad)} con orden distinto al original" + (f" (p. ej. {bad[:5]})" if bad else ""))
+    return 1 if bad else 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks headless de TWOWTE")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    def season_args(p):
+        p.add_argument("--players", type=int, default=30)
+        p.add_argument("--judges", type=int, default=5)
+        p.add_argument("--rounds", type=int, default=20)
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("--top-k", type=int, default=0, help="frases por papeleta (0 = todas)")
+
+    p = sub.add_parser("run", help="latencia, SQL y memoria por rol")
+    season_args(p)
+    p.add_argument("--phrases", type=int, default=1, help="frases base por jugador y ronda")
+    p.add_argument("--purchase-rate", type=float, default=0.3)
+    p.add_argument("--reruns", type=int, default=20)
+    p.add_argument("--view", choices=VIEWS, default=None, help="medir sólo esta vista (por defecto, todas)")
+    p.add_argument("--save-baseline", action="store_true")
+    p.add_argument("--compare", action="store_true")
+    p.set_defaults(func=run)
+
+    p = sub.add_parser("concurrent", help="sesiones AppTest simultáneas (un proceso cada una)")
+    season_args(p)
+    p.add_argument("--sessions", type=int, default=40)
+    p.add_argument("--reruns", type=int, default=5)
+    p.add_argument("--write-rate", type=float, default=0.3)
+    p.set_defaults(func=concurrent)
+
+    p = sub.add_parser("contention", help="hilos sobre la conexión compartida o el pool")
+    season_args(p)
+    p.add_argument("--engine", choices=["shared", "pool"], default="pool")
+    p.add_argument("--sessions", type=int, default=40)
+    p.add_argument("--reruns", type=int, default=50)
+    p.add_argument("--write-rate", type=float, default=0.3)
+    p.set_defaults(func=contention)
+
+    p = sub.add_parser("scoring", help="orden de score_round frente al recuento original")
+    p.add_argument("--rounds", type=int, default=2000)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--top-k", type=int, default=0, help="frases por papeleta (0 = todas)")
+    p.set_defaults(func=scoring_check)
+
+    args = ap.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
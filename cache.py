@@ -0,0 +1,130 @@
+# Caché de lecturas por versión de datos
+# =============================================================================
+# Las lecturas que repiten todas las sesiones (frases de la ronda, autores que
+# ya enviaron, papeletas, compras, saldos, última ronda cerrada…) se guardan en
+# un LRU en memoria compartido por el proceso. La clave incluye la versión de
+# los datos de los que depende: los triggers de la migración 6 suben
+# data_versions['round:<id>'] con cada escritura en frases, papeletas, compras
+# y player_round de esa ronda, 'rounds' al abrir/cerrar rondas y 'users' con
+# cualquier cambio en usuarios. Mientras nadie escriba, cada rerun cuesta una
+# sola consulta (la de versiones) sin importar cuántas sesiones haya.
+#
+# Con varias ligas en el proceso (leagues.py) todas usan el mismo Store: la
+# ruta de la base forma parte de la clave y el límite de memoria es global.
+#
+# Los valores se comparten entre sesiones: quien los lee no debe modificarlos.
+# =============================================================================
+import collections
+import sys
+import threading
+
+MAX_BYTES = 32 * 1024 * 1024
+
+
+def round_key(round_id):
+    return f"round:{round_id}"
+
+
+def _size(obj):
+    """Tamaño aproximado en bytes (contenedores incluidos) para el límite del LRU."""
+    n = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        n += sum(_size(k) + _size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        n += sum(_size(x) for x in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        # objetos propios (Directory...): getsizeof sólo cuenta la cabecera
+        n += _size(vars(obj))
+    return n
+
+
+class Store:
+    """LRU acotado en bytes, con deduplicación de cálculos simultáneos de una misma clave."""
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._items = collections.OrderedDict()   # clave -> (valor, bytes)
+        self._bytes = 0
+        self._inflight = {}                       # clave -> Event de quien la calcula
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, fn, *args):
+        """Valor de key; si no está, fn(*args). Si varias sesiones fallan a la vez sólo una calcula."""
+        while True:
+            with self._lock:
+                item = self._items.get(key)
+                if item is not None:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return item[0]
+                waiting = self._inflight.get(key)
+                if waiting is None:
+                    self._inflight[key] = threading.Event()
+                    self.misses += 1
+                    break
+            waiting.wait()
+        try:
+            value = fn(*args)
+            self._store(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def _store(self, key, value):
+        size = _size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self, prefix=None):
+        """Vacía el LRU, o sólo las claves cuyo primer elemento es prefix."""
+        with self._lock:
+            if prefix is None:
+                self._items.clear()
+                self._bytes = 0
+                return
+            for key in [k for k in self._items if k[0] == prefix]:
+                self._bytes -= self._items.pop(key)[1]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+# un solo LRU por proceso: todas las bases (ligas) reparten el mismo presupuesto
+STORE = Store()
+
+
+class ReadCache:
+    """Lecturas de una base sobre el LRU compartido; la ruta de la base va en la clave."""
+
+    def __init__(self, pool, store=None):
+        self.pool = pool
+        self.store = store or STORE
+
+    def versions(self, *claves):
+        """Versión actual de cada clave en una sola consulta (0 si aún no hay escrituras)."""
+        marks = ",".join("?" * len(claves))
+        found = dict(self.pool.fetchall(f"SELECT clave, v FROM data_versions WHERE clave IN ({marks})", claves))
+        return {k: found.get(k, 0) for k in claves}
+
+    def get(self, version, fn, *args):
+        """fn(*args) cacheado bajo (base, función, args, versión)."""
+        return self.store.get((self.pool.path, fn.__module__, fn.__qualname__, args, version), fn, *args)
+
+    def clear(self):
+        self.store.clear(self.pool.path)
+
+    def stats(self):
+        return self.store.stats()
@@ -0,0 +1,149 @@
+# Capa de conexión SQLite
+# =============================================================================
+# Pool acotado de conexiones compartido por todos los hilos de Streamlit:
+#   • Cada hilo toma su propia conexión mientras la usa; dentro del mismo hilo
+#     el acceso es reentrante (una lectura dentro de una transacción reutiliza
+#     la conexión de esa transacción).
+#   • WAL + synchronous=NORMAL: las lecturas nunca esperan a un escritor.
+#   • Las escrituras van en transacciones cortas BEGIN IMMEDIATE, que esperan
+#     hasta busy_timeout en lugar de fallar con "database is locked".
+# =============================================================================
+import sqlite3
+import threading
+import queue
+from contextlib import contextmanager
+
+import textnorm
+
+POOL_SIZE = 8
+BUSY_TIMEOUT_MS = 5000
+ACQUIRE_TIMEOUT = 10.0
+
+
+class Pool:
+    def __init__(self, path, size=POOL_SIZE, busy_timeout_ms=BUSY_TIMEOUT_MS, cache_kib=None):
+        self.path = path
+        self.size = size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_kib = cache_kib  # caché de páginas por conexión (None = la de SQLite)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._all = []
+        self._trace = None
+        self.wrap = None  # p. ej. perf.TimedConnection para cronometrar sentencias
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None,
+                               timeout=self.busy_timeout_ms / 1000)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        if self.cache_kib:
+            conn.execute(f"PRAGMA cache_size=-{int(self.cache_kib)}")
+        conn.set_trace_callback(self._trace)
+        textnorm.register(conn)  # twowte_hash(), que usan los triggers de frases
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def set_trace(self, callback):
+        """Instala (o quita, con None) un trace_callback de sqlite3 en todas las conexiones."""
+        with self._lock:
+            self._trace = callback
+            for conn in self._all:
+                conn.set_trace_callback(callback)
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self._created < self.size
+            if grow:
+                self._created += 1
+        if grow:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=ACQUIRE_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError("pool de conexiones agotado") from None
+
+    def _checkin(self, conn):
+        if conn.in_transaction:  # nunca devolver una transacción a medias
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        wrap = self.wrap
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield wrap(held) if wrap else held
+            return
+        conn = self._checkout()
+        self._local.conn = conn
+        try:
+            yield wrap(conn) if wrap else conn
+        finally:
+            self._local.conn = None
+            self._checkin(conn)
+
+    @contextmanager
+    def tx(self):
+        """Transacción de escritura corta; si ya hay una abierta en el hilo, se une a ella."""
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def fetchone(self, sql, args=()):
+        with self.connection() as conn:
+            return conn.execute(sql, args).fetchone()
+
+    def fetchall(self, sql, args=()):
+        with self.connection() as conn:
+            return conn.execute(sql, args).fetchall()
+
+    def execute(self, sql, args=()):
+        with self.tx() as conn:
+            conn.execute(sql, args)
+
+    def close(self):
+        """Cierra las conexiones libres del pool."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+                self._all.remove(conn)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path, **kw):
+    """Pool único por fichero de base de datos para todo el proceso."""
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = Pool(path, **kw)
+        return pool
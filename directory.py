@@ -0,0 +1,67 @@
+# Directorio de usuarios
+# =============================================================================
+# Vista de sólo lectura de la tabla users para las vistas: búsqueda por nombre
+# en O(1), listas por rol/estado y recuentos ya calculados al construirlo. No
+# guarda contraseñas: el login comprueba una sola fila por clave primaria.
+#
+# Se construye una vez por versión de data_versions['users'] (caché de
+# lecturas), que los triggers suben con cualquier alta, baja, rehabilitación,
+# eliminación o cambio de monedas, así que nunca hay que invalidarlo a mano.
+# =============================================================================
+import collections
+
+# posiciones en cada fila del directorio
+ROLE, IS_ADMIN, COINS, ACTIVE = range(1, 5)
+
+
+class Directory:
+    def __init__(self, rows):
+        self._rows = {r[0]: r for r in rows}
+        self._counts = collections.Counter((r[ROLE], r[ACTIVE]) for r in rows)
+        self._names = collections.defaultdict(list)
+        for r in rows:
+            self._names[r[ROLE], r[ACTIVE]].append(r[0])
+
+    def __contains__(self, username):
+        return username in self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get(self, username):
+        """(username, role, is_admin, coins, active) o None."""
+        return self._rows.get(username)
+
+    def role(self, username, default=None):
+        r = self._rows.get(username)
+        return r[ROLE] if r else default
+
+    def coins(self, username):
+        r = self._rows.get(username)
+        return r[COINS] if r else 0
+
+    def is_active(self, username):
+        r = self._rows.get(username)
+        return bool(r and r[ACTIVE])
+
+    def count(self, role, active=1):
+        return self._counts[role, active]
+
+    def names(self, role=None, active=None):
+        """Nombres filtrados por rol y/o estado, en el orden de la tabla."""
+        if role is not None and active is not None:
+            return list(self._names[role, active])
+        return [u for u, r in self._rows.items()
+                if (role is None or r[ROLE] == role) and (active is None or r[ACTIVE] == active)]
+
+
+def load(pool):
+    return Directory(pool.fetchall("SELECT username, role, is_admin, coins, active FROM users"))
+
+
+def login(pool, username, password):
+    """Fila (is_admin,) si las credenciales son válidas y la cuenta está activa; si no, None."""
+    return pool.fetchone("SELECT is_admin FROM users WHERE username=? AND password=? AND active=1", (username, password))
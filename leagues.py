@@ -0,0 +1,89 @@
+# Ligas
+# =============================================================================
+# Con TWOWTE_LEAGUES=<carpeta> un mismo proceso de Streamlit aloja varias
+# partidas: cada liga es un fichero <carpeta>/<nombre>.db con su propio
+# esquema, usuarios, ajustes y rondas, y cada sesión elige la suya (selector
+# en la barra lateral o ?liga=<nombre> en la URL).
+#
+# Lo que se comparte en el proceso:
+#   • el registro de pools (db.get_pool): un pool por fichero, pequeño
+#     (POOL_SIZE conexiones con CACHE_KIB de caché de páginas) y creado sólo
+#     cuando alguna sesión entra en la liga;
+#   • el LRU de lecturas (cache.STORE), con un único presupuesto de memoria.
+# Cada liga tiene su RoundCloser (un hilo), así que un cierre de ronda lento
+# en una liga no retrasa los de las demás; SQLite bloquea por fichero, de modo
+# que tampoco frena sus escrituras.
+#
+#   python leagues.py add amigos      # crea la liga (base migrada)
+#   python leagues.py list
+# =============================================================================
+import argparse
+import os
+import re
+import sys
+
+import db
+import schema
+
+ENV = "TWOWTE_LEAGUES"
+POOL_SIZE = 4
+CACHE_KIB = 1024
+_NAME = re.compile(r"[a-z0-9][a-z0-9_-]{0,39}")
+
+
+def folder():
+    """Carpeta de las ligas, o None si el proceso sirve una sola partida (TWOWTE_DB)."""
+    return os.environ.get(ENV) or None
+
+
+def valid(name):
+    return bool(name and _NAME.fullmatch(name))
+
+
+def available(base):
+    """Nombres de las ligas de la carpeta, ordenados."""
+    if not os.path.isdir(base):
+        return []
+    return sorted(f[:-3] for f in os.listdir(base) if f.endswith(".db") and valid(f[:-3]))
+
+
+def path(base, name):
+    if not valid(name):
+        raise ValueError(f"nombre de liga no válido: {name!r}")
+    return os.path.join(base, name + ".db")
+
+
+def get_pool(db_path):
+    """Pool de una liga: mismo registro que db.get_pool, con tamaño y caché reducidos."""
+    return db.get_pool(db_path, size=POOL_SIZE, cache_kib=CACHE_KIB)
+
+
+def create(base, name):
+    """Crea (o migra) la base de la liga. Devuelve su ruta."""
+    os.makedirs(base, exist_ok=True)
+    p = path(base, name)
+    schema.migrate(get_pool(p))
+    return p
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Ligas de TWOWTE")
+    ap.add_argument("--dir", default=folder(), help=f"carpeta de las ligas (por defecto ${ENV})")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("add", help="crea una liga").add_argument("name")
+    sub.add_parser("list", help="lista las ligas")
+    args = ap.parse_args(argv)
+    if not args.dir:
+        ap.error(f"indica --dir o define {ENV}")
+
+    if args.cmd == "add":
+        if not valid(args.name):
+            ap.error("el nombre usa minúsculas, dígitos, '-' o '_' (máx. 40)")
+        print(f"Liga creada en {create(args.dir, args.name)}")
+    else:
+        for name in available(args.dir):
+            print(name)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+# Libro de monedas
+# =============================================================================
+# Todo movimiento de monedas (premios, compras, Ruleta, ajustes del admin) se
+# anota en coin_ledger (usuario, ronda, delta, motivo) y se aplica a
+# users.coins en la misma transacción, ambos con executemany. users.coins
+# queda como saldo materializado: leerlo es una búsqueda por clave primaria y
+# SUM(delta) del libro debe coincidir siempre con él (ver audit()).
+#
+# Al cerrar cada ronda se guarda en balance_snapshots el saldo de todos los
+# usuarios, así el historial de monedas se lee por índice sin recorrer el libro.
+# =============================================================================
+import datetime as dt
+
+PREMIO = "premio"
+COMPRA = "compra"
+RULETA = "ruleta"
+AJUSTE = "ajuste"
+
+
+def apply(c, entries):
+    """Anota y aplica [(username, round_id, delta, motivo)]. Debe llamarse dentro de pool.tx()."""
+    entries = [e for e in entries if e[2]]
+    if not entries:
+        return
+    now = dt.datetime.utcnow().isoformat()
+    c.executemany("INSERT INTO coin_ledger(username, round_id, delta, reason, created_at) VALUES(?,?,?,?,?)",
+                  [(u, rid, delta, reason, now) for u, rid, delta, reason in entries])
+    c.executemany("UPDATE users SET coins = coins + ? WHERE username=?",
+                  [(delta, u) for u, _, delta, _ in entries])
+
+
+def snapshot(c, round_id):
+    """Saldo de todos los usuarios al cierre de la ronda."""
+    c.execute("INSERT OR REPLACE INTO balance_snapshots(username, round_id, coins) SELECT username, ?, coins FROM users",
+              (round_id,))
+
+
+def history(pool, username):
+    """[(numero de ronda, saldo al cerrarla)] del usuario, en orden."""
+    return pool.fetchall("""
+        SELECT r.numero, b.coins FROM balance_snapshots b JOIN rounds r ON r.id = b.round_id
+        WHERE b.username=? ORDER BY r.numero""", (username,))
+
+
+def audit(pool):
+    """Usuarios cuyo saldo no cuadra con el libro: [(username, coins, suma del libro)]."""
+    return pool.fetchall("""
+        SELECT u.username, u.coins, COALESCE(SUM(l.delta), 0) AS libro
+        FROM users u LEFT JOIN coin_ledger l ON l.username = u.username
+        GROUP BY u.username HAVING u.coins <> libro""")
@@ -0,0 +1,75 @@
+# Actualización en vivo
+# =============================================================================
+# Acción y Resultados se refrescan solos dentro de fragments de Streamlit
+# (st.fragment con run_every): sólo se vuelve a ejecutar el fragment, no la
+# página. Cada sesión guarda en su session_state lo que ya conoce de la ronda
+# (frases, autores, jueces que votaron, último frases.id / votos.id vistos y
+# la versión de la ronda) y en cada tick:
+#   1. compara data_versions['round:<id>'] (una lectura por clave primaria);
+#   2. sólo si cambió, trae las frases y votos con id mayor que los ya vistos.
+# Con la ronda quieta las consultas se espacian: tras cada tick sin cambios se
+# saltan 1, 3, 7… ticks hasta un máximo de MAX_BACKOFF - 1. Esto sólo ahorra
+# SQL: Streamlit vuelve a pintar el fragment cada live_interval segundos
+# igualmente (run_every es fijo), desde el estado guardado en la sesión.
+#
+# El refresco es opcional: live_interval vale 0 (manual) hasta que el admin
+# lo activa en la pestaña Admin.
+# =============================================================================
+import cache
+
+MAX_BACKOFF = 8
+
+
+def new_state(round_id, version, ronda):
+    """Estado inicial a partir de la lectura (cacheada) de la ronda."""
+    frases = list(ronda["frases"])
+    return {
+        "round_id": round_id,
+        "version": version,
+        "frases": frases,
+        "autores": set(ronda["autores"]),
+        "jueces": set(ronda["jueces"]),
+        "frase_id": max((f[0] for f in frases), default=0),
+        "voto_id": ronda["voto_id"],
+        "idle": 0,
+        "skip": 0,
+        "fresh": True,
+        "closed": False,
+    }
+
+
+def tick(pool, state):
+    """Un tick del refresco. Devuelve True si llegaron frases o votos nuevos.
+
+    Si la ronda se cerró deja state["closed"] a True: toca recargar la página.
+    """
+    if state.pop("fresh", False):
+        return False        # el rerun completo acaba de sembrar el estado
+    if state["skip"] > 0:
+        state["skip"] -= 1
+        return False
+    rid = state["round_id"]
+    changed = False
+    with pool.connection() as c:
+        row = c.execute("SELECT v FROM data_versions WHERE clave=?", (cache.round_key(rid),)).fetchone()
+        version = row[0] if row else 0
+        if version != state["version"]:
+            state["version"] = version
+            frases = c.execute("SELECT id, texto, autor FROM frases WHERE round_id=? AND id>? ORDER BY id",
+                               (rid, state["frase_id"])).fetchall()
+            votos = c.execute("""
+                SELECT v.juez, MAX(v.id) FROM votos v JOIN frases f ON f.id = v.frase_id
+                WHERE v.id > ? AND f.round_id = ? GROUP BY v.juez""", (state["voto_id"], rid)).fetchall()
+            status = c.execute("SELECT status FROM rounds WHERE id=?", (rid,)).fetchone()
+            if frases:
+                state["frases"].extend(frases)
+                state["autores"].update(f[2] for f in frases)
+                state["frase_id"] = frases[-1][0]
+            if votos:
+                state["jueces"].update(j for j, _ in votos)
+                state["voto_id"] = max(v for _, v in votos)
+            state["closed"] = not status or status[0] != 'open'
+            changed = bool(frases or votos)
+    state["idle"] = 0 if changed else state["idle"] + 1
+    state["skip"] = min(2 ** state["idle"], MAX_BACKOFF) - 1
+    return changed
@@ -0,0 +1,231 @@
+# Instrumentación opcional de SQL y render
+# =============================================================================
+# Desactivada por defecto (se activa desde Admin → Rendimiento o con
+# TWOWTE_PERF=1). Cuando está activa:
+#   • el pool entrega conexiones envueltas que cronometran cada sentencia
+#     (execute + fetch) y la agrupan por "forma" (SQL sin literales);
+#   • section() cronometra cada bloque de la página;
+#   • cada rerun queda registrado (latencia, secciones, nº de consultas) en un
+#     buffer circular de los últimos RECENT reruns de todas las sesiones.
+# snapshot()/export() devuelven todo en un dict/JSON para analizarlo fuera.
+# =============================================================================
+import collections
+import heapq
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+RECENT = 500
+TOP_SLOWEST = 25
+
+_lock = threading.Lock()
+_local = threading.local()
+_enabled = False
+_pools = []
+_reruns = collections.deque(maxlen=RECENT)
+_open = {}       # sesión -> rerun aún sin cerrar
+_shapes = {}     # forma -> [n, total_ms, max_ms]
+_slowest = []    # heap (ms, sql) con las TOP_SLOWEST sentencias más lentas
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def shape(sql):
+    """SQL normalizado: sin literales, listas IN colapsadas y espacios simples."""
+    s = _LITERALS.sub("?", sql)
+    s = _IN_LIST.sub("(?…)", s)
+    return _SPACES.sub(" ", s).strip()
+
+
+def enabled():
+    return _enabled
+
+
+def enable(pool):
+    global _enabled
+    with _lock:
+        if pool not in _pools:
+            _pools.append(pool)
+        pool.wrap = TimedConnection
+        _enabled = True
+
+
+def disable():
+    global _enabled
+    with _lock:
+        for pool in _pools:
+            pool.wrap = None
+        _enabled = False
+
+
+def reset():
+    with _lock:
+        _reruns.clear()
+        _open.clear()
+        _shapes.clear()
+        _slowest.clear()
+
+
+# ---------- Sentencias ------------------------------------------------------
+def _record(sql, ms, count=1):
+    key = shape(sql)
+    with _lock:
+        st = _shapes.get(key)
+        if st is None:
+            st = _shapes[key] = [0, 0.0, 0.0]
+        st[0] += count
+        st[1] += ms
+        st[2] = max(st[2], ms)
+        entry = (ms, key)
+        if len(_slowest) < TOP_SLOWEST:
+            heapq.heappush(_slowest, entry)
+        elif entry > _slowest[0]:
+            heapq.heapreplace(_slowest, entry)
+    rec = getattr(_local, "rerun", None)
+    if rec is not None:
+        rec["queries"] += count
+        rec["sql_ms"] += ms
+        rec["last"] = time.perf_counter()
+
+
+class TimedCursor:
+    __slots__ = ("_cur", "_sql")
+
+    def __init__(self, cur, sql):
+        self._cur = cur
+        self._sql = sql
+
+    def _timed(self, fn, *a):
+        t0 = time.perf_counter()
+        try:
+            return fn(*a)
+        finally:
+            _record(self._sql, (time.perf_counter() - t0) * 1000, count=0)
+
+    def fetchone(self):
+        return self._timed(self._cur.fetchone)
+
+    def fetchall(self):
+        return self._timed(self._cur.fetchall)
+
+    def fetchmany(self, size=None):
+        return self._timed(self._cur.fetchmany, size or self._cur.arraysize)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+
+class TimedConnection:
+    """Envoltorio de sqlite3.Connection que cronometra execute/executemany/commit."""
+    __slots__ = ("_conn",)
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql, args=()):
+        t0 = time.perf_counter()
+        try:
+            cur = self._conn.execute(sql, args)
+        finally:
+            _record(sql, (time.perf_counter() - t0) * 1000)
+        return TimedCursor(cur, sql)
+
+    def executemany(self, sql, seq):
+        t0 = time.perf_counter()
+        try:
+            return self._conn.executemany(sql, seq)
+        finally:
+            _record(sql, (time.perf_counter() - t0) * 1000)
+
+    def commit(self):
+        t0 = time.perf_counter()
+        try:
+            self._conn.commit()
+        finally:
+            _record("COMMIT", (time.perf_counter() - t0) * 1000)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+# ---------- Reruns y secciones ----------------------------------------------
+def _finish(rec, end):
+    rec["total_ms"] = round((end - rec.pop("t0")) * 1000, 2)
+    rec["sql_ms"] = round(rec["sql_ms"], 2)
+    rec.pop("last", None)
+    _reruns.append(rec)
+
+
+def begin_rerun(session, user=None):
+    """Marca el inicio de un rerun de la sesión.
+
+    Un rerun cortado por st.stop()/st.rerun() no llega a end_rerun(); se cierra
+    aquí, en el siguiente rerun de la sesión, con la hora de su última actividad.
+    """
+    if not _enabled:
+        _local.rerun = None
+        return
+    now = time.perf_counter()
+    with _lock:
+        prev = _open.pop(session, None)
+        if prev is not None:
+            _finish(prev, prev["last"])
+        rec = {"ts": time.time(), "session": session, "user": user, "t0": now, "last": now,
+               "queries": 0, "sql_ms": 0.0, "sections": {}}
+        _open[session] = rec
+    _local.rerun = rec
+
+
+def end_rerun():
+    rec = getattr(_local, "rerun", None)
+    if rec is None:
+        return
+    _local.rerun = None
+    with _lock:
+        if _open.get(rec["session"]) is rec:
+            del _open[rec["session"]]
+            _finish(rec, time.perf_counter())
+
+
+@contextmanager
+def _timed_section(name):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        rec = getattr(_local, "rerun", None)
+        if rec is not None:
+            end = time.perf_counter()
+            rec["sections"][name] = round(rec["sections"].get(name, 0.0) + (end - t0) * 1000, 2)
+            rec["last"] = end
+
+
+def section(name):
+    return _timed_section(name) if _enabled else nullcontext()
+
+
+# ---------- Consulta y exportación ------------------------------------------
+def snapshot():
+    with _lock:
+        shapes = sorted(({"sql": k, "n": v[0], "total_ms": round(v[1], 2), "max_ms": round(v[2], 2),
+                          "avg_ms": round(v[1] / v[0], 3) if v[0] else 0.0} for k, v in _shapes.items()),
+                        key=lambda r: r["total_ms"], reverse=True)
+        slowest = [{"ms": round(ms, 2), "sql": sql} for ms, sql in sorted(_slowest, reverse=True)]
+        reruns = list(_reruns)
+    return {"enabled": _enabled, "exported_at": time.time(), "reruns": reruns, "shapes": shapes, "slowest": slowest}
+
+
+def export(path=None):
+    """JSON con el estado actual; si se da path, además se escribe a disco."""
+    data = json.dumps(snapshot(), indent=2, ensure_ascii=False)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(data)
+    return data
@@ -0,0 +1,124 @@
+# Cierre de rondas
+# =============================================================================
+# El cierre (premios, eliminación, clasificación y apertura de la siguiente
+# ronda) se hace en una sola transacción que reclama la ronda con un
+# compare-and-swap sobre rounds.status: sólo quien pasa de 'open' a 'closed'
+# la cierra, así que nunca se paga dos veces ni se abren dos rondas nuevas.
+#
+# El cierre automático lo ejecuta un hilo en segundo plano (RoundCloser) al
+# que se avisa cuando entra una papeleta; los reruns de los usuarios sólo leen.
+# =============================================================================
+import datetime as dt
+import logging
+import os
+import queue
+import threading
+
+import ledger
+import scoring
+
+log = logging.getLogger(__name__)
+
+
+def ready(pool, round_id):
+    """¿Hay frases y han votado todos los jueces activos?"""
+    row = pool.fetchone("""
+        SELECT (SELECT COUNT(*) FROM frases WHERE round_id=:r),
+               (SELECT COUNT(*) FROM ballots WHERE round_id=:r),
+               (SELECT COUNT(*) FROM users WHERE role='juez' AND active=1)""", {"r": round_id})
+    enviados, got, need = row
+    return enviados > 0 and got >= need
+
+
+def open_round(pool, cfg):
+    """(id, numero) de la ronda abierta; la crea si no hay ninguna (base nueva)."""
+    q = "SELECT id, numero FROM rounds WHERE status='open' ORDER BY numero DESC LIMIT 1"
+    row = pool.fetchone(q)
+    if row:
+        return row
+    with pool.tx() as c:
+        # otra sesión pudo abrirla mientras esperábamos el bloqueo de escritura
+        row = c.execute(q).fetchone()
+        if row:
+            return row
+        numero = cfg.get("current_round")
+        rid = c.execute("INSERT INTO rounds(numero,status,created_at) VALUES(?,?,?)", (numero, 'open', dt.datetime.utcnow().isoformat())).lastrowid
+        players = c.execute("SELECT username FROM users WHERE active=1").fetchall()
+        c.executemany("INSERT INTO player_round(round_id,username,responses_left) VALUES(?,?,1)", [(rid, p[0]) for p in players])
+    return rid, numero
+
+
+def close_round(pool, cfg, round_id):
+    """Cierra la ronda si sigue abierta. Devuelve un resumen, o None si no había nada que cerrar."""
+    with pool.tx() as c:
+        row = c.execute("SELECT numero, status FROM rounds WHERE id=?", (round_id,)).fetchone()
+        if not row or row[1] != 'open':
+            return None
+        res = scoring.score_round(c, round_id)
+        if not res:
+            return None
+        # compare-and-swap: con BEGIN IMMEDIATE somos el único escritor, pero
+        # la condición deja explícito que sólo se reclama una ronda abierta
+        if c.execute("UPDATE rounds SET status='closed' WHERE id=? AND status='open'", (round_id,)).rowcount != 1:
+            return None
+
+        recomp = [cfg.get("reward_first"), cfg.get("reward_second"), cfg.get("reward_third"), cfg.get("reward_45"), cfg.get("reward_45")]
+        pagos = scoring.payouts(res, recomp, cfg.get("reward_participate"))
+        ledger.apply(c, [(u, round_id, coins, ledger.PREMIO) for coins, u in pagos])
+
+        # Determinar eliminado: peor "mejor" puesto
+        eliminado = scoring.eliminated(res)
+        scoring.save_standings(c, scoring.standings(res, pagos, eliminado))
+        c.execute("UPDATE users SET active=0 WHERE username=?", (eliminado,))
+        ledger.snapshot(c, round_id)
+
+        # preparar nueva ronda
+        next_num = row[0] + 1
+        cfg.set("current_round", next_num)
+        new_rid = c.execute("INSERT INTO rounds(numero,status,created_at) VALUES(?,?,?)", (next_num, 'open', dt.datetime.utcnow().isoformat())).lastrowid
+        activos = c.execute("SELECT username FROM users WHERE active=1").fetchall()
+        c.executemany("INSERT INTO player_round(round_id, username, responses_left) VALUES(?,?,1)", [(new_rid, a[0]) for a in activos])
+    return {"round_id": round_id, "numero": row[0], "eliminado": eliminado, "next_round_id": new_rid, "tabla": res["tabla"]}
+
+
+class RoundCloser:
+    """Hilo único por base de datos que cierra las rondas listas.
+
+    Con varias ligas hay uno por liga: un cierre lento sólo retrasa a la suya.
+    """
+
+    def __init__(self, pool, cfg):
+        self.pool = pool
+        self.cfg = cfg
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"round-closer:{os.path.basename(pool.path)}", daemon=True)
+        self._thread.start()
+
+    def request(self, round_id):
+        """Avisa de que la ronda puede estar lista. Es barato e idempotente."""
+        with self._lock:
+            if round_id in self._pending:
+                return
+            self._pending.add(round_id)
+        self._queue.put(round_id)
+
+    def pending(self, round_id):
+        """¿Está la ronda en cola o cerrándose? Lectura sin bloqueo para los ticks en vivo."""
+        return round_id in self._pending
+
+    def _run(self):
+        while True:
+            round_id = self._queue.get()
+            try:
+                if ready(self.pool, round_id):
+                    closed = close_round(self.pool, self.cfg, round_id)
+                    if closed:
+                        log.info("Ronda %s cerrada. Eliminado: %s", closed["numero"], closed["eliminado"])
+            except Exception:
+                log.exception("Fallo al cerrar la ronda %s", round_id)
+            finally:
+                with self._lock:
+                    self._pending.discard(round_id)
+                self._queue.task_done()
@@ -0,0 +1,241 @@
+# Migraciones de esquema
+# =============================================================================
+# Cada migración es una función que recibe la conexión dentro de una
+# transacción de escritura. La versión aplicada se guarda en PRAGMA
+# user_version, así que arrancar sobre una base ya migrada cuesta una sola
+# lectura. Las bases anteriores a este sistema tienen user_version=0 y todas
+# las migraciones son idempotentes sobre ellas.
+# =============================================================================
+import scoring
+import textnorm
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users(
+  username TEXT PRIMARY KEY,
+  password TEXT NOT NULL,
+  role TEXT NOT NULL,            -- 'jugador' | 'juez'
+  is_admin INTEGER NOT NULL,
+  coins INTEGER NOT NULL DEFAULT 0,
+  active INTEGER NOT NULL DEFAULT 1);
+
+CREATE TABLE IF NOT EXISTS settings(clave TEXT PRIMARY KEY, valor TEXT);
+
+CREATE TABLE IF NOT EXISTS rounds(
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  numero INTEGER NOT NULL,
+  status TEXT NOT NULL,
+  created_at TEXT NOT NULL);
+
+CREATE TABLE IF NOT EXISTS frases(
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  texto TEXT NOT NULL,
+  autor TEXT NOT NULL,
+  round_id INTEGER NOT NULL);
+
+CREATE TABLE IF NOT EXISTS votos(
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  juez TEXT NOT NULL,
+  frase_id INTEGER NOT NULL,
+  posicion INTEGER NOT NULL);
+
+CREATE TABLE IF NOT EXISTS player_round(
+  round_id INTEGER NOT NULL,
+  username TEXT NOT NULL,
+  responses_left INTEGER NOT NULL,
+  df_flag INTEGER NOT NULL DEFAULT 0,
+  multiplier INTEGER NOT NULL DEFAULT 1,
+  penalty INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY(round_id,username));
+
+CREATE TABLE IF NOT EXISTS purchases(
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  round_id INTEGER NOT NULL,
+  username TEXT NOT NULL,
+  item TEXT NOT NULL,
+  meta TEXT);
+
+-- clasificación final materializada al cerrar cada ronda (la lee el Historial)
+CREATE TABLE IF NOT EXISTS round_results(
+  round_id INTEGER NOT NULL,
+  username TEXT NOT NULL,
+  rank INTEGER NOT NULL,
+  puntos INTEGER NOT NULL,
+  std REAL NOT NULL,
+  reward INTEGER,                -- NULL en rondas recuperadas por backfill
+  eliminated INTEGER,            -- ídem: las reglas de entonces no se guardaron
+  PRIMARY KEY(round_id,username));
+
+CREATE INDEX IF NOT EXISTS idx_round_results_user ON round_results(username, rank);
+"""
+
+
+def _columns(c, table):
+    return {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+
+
+def _m1_base(c):
+    for ddl in SCHEMA.split(";"):
+        c.execute(ddl)
+    # bases de versiones previas sin la columna penalty
+    if "penalty" not in _columns(c, "player_round"):
+        c.execute("ALTER TABLE player_round ADD COLUMN penalty INTEGER NOT NULL DEFAULT 0")
+
+
+def _m2_indexes(c):
+    # el flujo de voto borra e inserta, pero por si acaso: nos quedamos con el último
+    c.execute("DELETE FROM votos WHERE id NOT IN (SELECT MAX(id) FROM votos GROUP BY juez, frase_id)")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_votos_juez_frase ON votos(juez, frase_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_votos_frase ON votos(frase_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_frases_round_autor ON frases(round_id, autor)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_frases_autor ON frases(autor)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_purchases_round_user ON purchases(round_id, username)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_rounds_status_numero ON rounds(status, numero)")
+
+
+def _m3_backfill_standings(c):
+    # temporadas anteriores a round_results
+    scoring.backfill_standings(c)
+
+
+def _m4_data_versions(c):
+    # contadores que suben con cada escritura; las cachés en memoria los comparan
+    c.execute("CREATE TABLE IF NOT EXISTS data_versions(clave TEXT PRIMARY KEY, v INTEGER NOT NULL)")
+    c.execute("INSERT OR IGNORE INTO data_versions VALUES('settings', 0)")
+    for op in ("INSERT", "UPDATE", "DELETE"):
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_settings_{op.lower()} AFTER {op} ON settings
+            BEGIN UPDATE data_versions SET v = v + 1 WHERE clave='settings'; END""")
+
+
+def _m5_ballots(c):
+    # una fila por papeleta enviada; se reconstruye desde los votos existentes
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS ballots(
+          round_id INTEGER NOT NULL,
+          juez TEXT NOT NULL,
+          submitted_at TEXT NOT NULL,
+          n_frases INTEGER NOT NULL,
+          PRIMARY KEY(round_id, juez))""")
+    c.execute("""
+        INSERT OR IGNORE INTO ballots(round_id, juez, submitted_at, n_frases)
+        SELECT f.round_id, v.juez, '', COUNT(*)
+        FROM votos v JOIN frases f ON f.id = v.frase_id
+        GROUP BY f.round_id, v.juez""")
+
+
+def _bump(clave):
+    return f"INSERT INTO data_versions VALUES({clave}, 1) ON CONFLICT(clave) DO UPDATE SET v = v + 1;"
+
+
+def _m6_read_versions(c):
+    # versiones para la caché de lecturas: una por ronda, más 'rounds' y 'users'
+    c.execute("INSERT OR IGNORE INTO data_versions VALUES('rounds', 0)")
+    c.execute("INSERT OR IGNORE INTO data_versions VALUES('users', 0)")
+    for tbl in ("frases", "ballots", "purchases", "player_round"):
+        for op, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            c.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{tbl}_{op.lower()}_version AFTER {op} ON {tbl}
+                BEGIN {_bump(f"'round:' || {row}.round_id")} END""")
+    for op, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_rounds_{op.lower()}_version AFTER {op} ON rounds
+            BEGIN {_bump(f"'round:' || {row}.id")} {_bump("'rounds'")} END""")
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_users_{op.lower()}_version AFTER {op} ON users
+            BEGIN {_bump("'users'")} END""")
+
+
+def _m7_coin_ledger(c):
+    # libro de monedas y saldos por ronda; el libro arranca con el saldo actual
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS coin_ledger(
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          username TEXT NOT NULL,
+          round_id INTEGER,
+          delta INTEGER NOT NULL,
+          reason TEXT NOT NULL,
+          created_at TEXT NOT NULL)""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_coin_ledger_user ON coin_ledger(username, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_coin_ledger_round ON coin_ledger(round_id)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS balance_snapshots(
+          username TEXT NOT NULL,
+          round_id INTEGER NOT NULL,
+          coins INTEGER NOT NULL,
+          PRIMARY KEY(username, round_id))""")
+    c.execute("""
+        INSERT INTO coin_ledger(username, round_id, delta, reason, created_at)
+        SELECT username, NULL, coins, 'saldo inicial', datetime('now') FROM users
+        WHERE coins <> 0 AND NOT EXISTS (SELECT 1 FROM coin_ledger l WHERE l.username = users.username)""")
+
+
+def _m8_search(c):
+    # búsqueda de texto (FTS5 sobre frases.texto) y huella del texto normalizado
+    # para detectar duplicados; ambas las mantienen triggers (textnorm.register
+    # debe estar en la conexión: lo hace db.Pool)
+    if "texto_hash" not in _columns(c, "frases"):
+        c.execute("ALTER TABLE frases ADD COLUMN texto_hash INTEGER")
+    c.execute(f"UPDATE frases SET texto_hash = {textnorm.SQL_FUNCTION}(texto)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_frases_hash ON frases(texto_hash)")
+    for op in ("INSERT", "UPDATE OF texto"):
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_frases_hash_{op.split()[0].lower()} AFTER {op} ON frases
+            BEGIN UPDATE frases SET texto_hash = {textnorm.SQL_FUNCTION}(NEW.texto) WHERE id = NEW.id; END""")
+    c.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS frases_fts USING fts5(
+          texto, content='frases', content_rowid='id', tokenize='unicode61 remove_diacritics 2')""")
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_frases_fts_insert AFTER INSERT ON frases
+        BEGIN INSERT INTO frases_fts(rowid, texto) VALUES(NEW.id, NEW.texto); END""")
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_frases_fts_delete AFTER DELETE ON frases
+        BEGIN INSERT INTO frases_fts(frases_fts, rowid, texto) VALUES('delete', OLD.id, OLD.texto); END""")
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_frases_fts_update AFTER UPDATE OF texto ON frases
+        BEGIN
+          INSERT INTO frases_fts(frases_fts, rowid, texto) VALUES('delete', OLD.id, OLD.texto);
+          INSERT INTO frases_fts(rowid, texto) VALUES(NEW.id, NEW.texto);
+        END""")
+    c.execute("INSERT INTO frases_fts(frases_fts) VALUES('rebuild')")
+
+
+def _m9_nullable_eliminated(c):
+    # eliminated era NOT NULL y el backfill lo rellenaba con las reglas de hoy;
+    # SQLite no cambia restricciones con ALTER, así que se rehace la tabla
+    notnull = {row[1]: row[3] for row in c.execute("PRAGMA table_info(round_results)")}
+    if notnull.get("eliminated"):
+        c.execute("ALTER TABLE round_results RENAME TO round_results_old")
+        c.execute("""
+            CREATE TABLE round_results(
+              round_id INTEGER NOT NULL,
+              username TEXT NOT NULL,
+              rank INTEGER NOT NULL,
+              puntos INTEGER NOT NULL,
+              std REAL NOT NULL,
+              reward INTEGER,
+              eliminated INTEGER,
+              PRIMARY KEY(round_id,username))""")
+        c.execute("""
+            INSERT INTO round_results(round_id, username, rank, puntos, std, reward, eliminated)
+            SELECT round_id, username, rank, puntos, std, reward, CASE WHEN reward IS NULL THEN NULL ELSE eliminated END
+            FROM round_results_old""")
+        c.execute("DROP TABLE round_results_old")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_round_results_user ON round_results(username, rank)")
+
+
+MIGRATIONS = [_m1_base, _m2_indexes, _m3_backfill_standings, _m4_data_versions, _m5_ballots, _m6_read_versions, _m7_coin_ledger,
+              _m8_search, _m9_nullable_eliminated]
+
+
+def migrate(pool):
+    """Aplica las migraciones pendientes. Devuelve la versión final del esquema."""
+    target = len(MIGRATIONS)
+    if pool.fetchone("PRAGMA user_version")[0] >= target:
+        return target
+    with pool.tx() as c:
+        # releer dentro del bloqueo: otro proceso pudo migrar mientras tanto
+        version = c.execute("PRAGMA user_version").fetchone()[0]
+        for step in MIGRATIONS[version:]:
+            step(c)
+        c.execute(f"PRAGMA user_version={target}")
+    return target
@@ -0,0 +1,158 @@
+# Motor de puntuación de rondas
+# =============================================================================
+# Una sola implementación del recuento que usan el cierre automático, la
+# pestaña Resultados y el cierre manual del admin. Todo el estado de la ronda
+# se obtiene en dos consultas (frases+player_round y votos) y el cálculo de
+# puntos, STD y desempates se hace con arrays de NumPy.
+#
+# Papeletas parciales: un juez puede ordenar sólo sus K mejores de N frases.
+# Las que no ordenó quedan empatadas en el puesto medio de los que dejó
+# libres, (K+1+N)/2; con papeletas completas el resultado es el de siempre.
+# El coste depende de los votos emitidos, no de jueces × frases.
+# =============================================================================
+import numpy as np
+
+
+def score_round(conn, round_id):
+    """Puntúa una ronda. Devuelve None si la ronda no tiene frases."""
+    frases = conn.execute("""
+        SELECT f.id, f.texto, f.autor,
+               COALESCE(pr.penalty, 0), COALESCE(pr.df_flag, 0), COALESCE(pr.multiplier, 1)
+        FROM frases f
+        LEFT JOIN player_round pr ON pr.round_id = f.round_id AND pr.username = f.autor
+        WHERE f.round_id=?
+        ORDER BY f.id""", (round_id,)).fetchall()
+    if not frases:
+        return None
+    votos = conn.execute("""
+        SELECT v.frase_id, v.posicion, v.juez
+        FROM votos v JOIN frases f ON f.id = v.frase_id
+        WHERE f.round_id=?""", (round_id,)).fetchall()
+
+    N = len(frases)
+    ids = np.fromiter((f[0] for f in frases), dtype=np.int64, count=N)
+    pen = np.fromiter((f[3] for f in frases), dtype=np.int64, count=N)
+    df = np.fromiter((f[4] for f in frases), dtype=np.int64, count=N)
+    if votos:
+        idx = np.searchsorted(ids, np.fromiter((v[0] for v in votos), dtype=np.int64, count=len(votos)))  # ids viene ordenado
+        pos = np.fromiter((v[1] for v in votos), dtype=np.float64, count=len(votos))
+        _, juez = np.unique([v[2] for v in votos], return_inverse=True)
+    else:
+        idx = juez = np.zeros(0, dtype=np.int64)
+        pos = np.zeros(0)
+    total, std, order = tally(N, idx, pos, juez, pen, df)
+
+    tabla = []
+    for i in order:
+        _, txt, aut, _, flag, _ = frases[i]
+        tabla.append({"Autor": aut, "Puntos": _puntos(total[i]), "DF": bool(flag), "STD": float(std[i]), "Frase": txt})
+    return {
+        "round_id": round_id,
+        "tabla": tabla,
+        "orden": [r["Autor"] for r in tabla],
+        "mult": {f[2]: f[5] for f in frases},
+    }
+
+
+def tally(N, idx, pos, juez, pen, df):
+    """Recuento sobre arrays: (total, std, orden) de N frases.
+
+    idx/pos/juez describen cada voto (frase 0..N-1, puesto, juez 0..B-1);
+    pen y df son la penalización y el flag de desempate de cada frase. Lo
+    usan score_round y el simulador de temporadas.
+    """
+    if len(idx):
+        k = np.bincount(juez)                           # frases ordenadas por cada juez
+        B = len(k)
+        # Todo en medios puestos enteros (2 × puesto): las sumas son exactas y el
+        # desempate por STD no depende del ruido de coma flotante.
+        f2 = k + 1 + N                                  # 2 × puesto de las que no ordenó
+        p2 = np.rint(2 * pos).astype(np.int64)
+        fv = f2[juez]
+        # cada juez aporta fill a todas las frases y se corrige en las que sí ordenó
+        s1 = int(f2.sum()) + np.rint(np.bincount(idx, weights=p2 - fv, minlength=N)).astype(np.int64)
+        s2 = int((f2 * f2).sum()) + np.rint(np.bincount(idx, weights=p2 * p2 - fv * fv, minlength=N)).astype(np.int64)
+        dev = B * s2 - s1 * s1                          # 4·B²·varianza, entero exacto
+        total2 = 2 * B * (N + 1) - s1 + 2 * pen         # 2 × puntos
+        std = np.sqrt(dev) / (2 * B)
+    else:
+        dev = np.zeros(N, dtype=np.int64)
+        total2 = 2 * pen
+        std = np.zeros(N)
+
+    total = total2 / 2
+    # Puntos, luego DF y luego STD, todos de mayor a menor y sobre claves
+    # enteras; a igualdad se respeta el orden de envío (igual que el sort
+    # estable de antes).
+    order = np.lexsort((np.arange(N), -dev, -df, -total2))
+    return total, std, order
+
+
+def _puntos(x):
+    # enteros con papeletas completas; medio punto posible con parciales
+    x = round(float(x), 1)
+    return int(x) if x.is_integer() else x
+
+
+def payouts(res, recomp, participa):
+    """Lista (monedas, usuario) a pagar: una recompensa por frase según su puesto."""
+    pagos = []
+    for idx, pl in enumerate(res["orden"]):
+        reward = recomp[idx] if idx < len(recomp) else participa
+        pagos.append((reward * res["mult"].get(pl, 1), pl))
+    return pagos
+
+
+def eliminated(res):
+    """Jugador con el peor "mejor" puesto de la ronda."""
+    best_pos = {}
+    for idx, aut in enumerate(res["orden"]):
+        if aut not in best_pos:
+            best_pos[aut] = idx  # primera aparición (mejor puesto)
+    return max(best_pos.items(), key=lambda x: x[1])[0]
+
+
+def standings(res, pagos, eliminado):
+    """Clasificación final por jugador para la tabla round_results.
+
+    El puesto de cada jugador es el de su mejor frase; la recompensa es la suma
+    de lo cobrado por todas sus frases. Recompensa y eliminado quedan a None si
+    no se conocen (backfill).
+    """
+    cobrado = None
+    if pagos is not None:
+        cobrado = {}
+        for monto, pl in pagos:
+            cobrado[pl] = cobrado.get(pl, 0) + monto
+    filas, vistos = [], set()
+    for r in res["tabla"]:
+        aut = r["Autor"]
+        if aut in vistos:
+            continue
+        vistos.add(aut)
+        filas.append((res["round_id"], aut, len(filas) + 1, r["Puntos"], r["STD"],
+                      cobrado.get(aut, 0) if cobrado is not None else None,
+                      int(aut == eliminado) if eliminado is not None else None))
+    return filas
+
+
+def save_standings(conn, filas):
+    conn.executemany("INSERT OR REPLACE INTO round_results(round_id, username, rank, puntos, std, reward, eliminated) "
+                     "VALUES(?,?,?,?,?,?,?)", filas)
+
+
+def backfill_standings(conn):
+    """Materializa las rondas cerradas que aún no tienen clasificación guardada.
+
+    Sólo se recalcula la clasificación: quién cayó y cuánto cobró dependían de las
+    reglas de entonces, así que eliminated y reward quedan a NULL.
+    """
+    pendientes = conn.execute("""
+        SELECT id FROM rounds
+        WHERE status='closed' AND id NOT IN (SELECT DISTINCT round_id FROM round_results)
+        ORDER BY numero""").fetchall()
+    for (rid,) in pendientes:
+        res = score_round(conn, rid)
+        if res:
+            save_standings(conn, standings(res, None, None))
+    return len(pendientes)
@@ -0,0 +1,63 @@
+# Búsqueda y duplicados de frases
+# =============================================================================
+# search() consulta frases_fts (FTS5, sin tildes ni mayúsculas) con filtros
+# opcionales de autor y número de ronda, ordenando por relevancia (bm25), y
+# sólo en rondas cerradas para no destapar autores antes del recuento. El
+# texto del usuario nunca llega crudo a MATCH: se normaliza y cada palabra va
+# entre comillas como prefijo ("pal"*), así que no hay sintaxis que inyectar.
+#
+# Los duplicados se buscan por frases.texto_hash (ver textnorm): una frase
+# repetida dentro de la misma ronda se rechaza al enviarla (incluso con Doble o
+# Triple Respuesta) y las que repiten una frase de rondas anteriores se marcan
+# para el admin. El índice y la huella los mantienen triggers (migración 8).
+# =============================================================================
+import textnorm
+
+LIMIT = 50
+
+
+def fts_query(texto):
+    """Expresión MATCH segura para el texto dado, o '' si no tiene palabras."""
+    return " ".join(f'"{w}"*' for w in textnorm.normalize(texto).split())
+
+
+def search(pool, texto="", autor=None, numero=None, limit=LIMIT):
+    """[(ronda, autor, frase)] que contienen las palabras de texto, de más a menos relevante.
+
+    Sólo rondas cerradas: las frases de la abierta son anónimas hasta el recuento.
+
+    Sin texto devuelve las frases más recientes que cumplan los filtros.
+    """
+    q = fts_query(texto)
+    args = {"q": q, "autor": autor, "numero": numero, "limit": limit}
+    if q:
+        return pool.fetchall("""
+            SELECT r.numero, f.autor, f.texto
+            FROM frases_fts JOIN frases f ON f.id = frases_fts.rowid JOIN rounds r ON r.id = f.round_id
+            WHERE frases_fts MATCH :q AND r.status = 'closed'
+              AND (:autor IS NULL OR f.autor = :autor) AND (:numero IS NULL OR r.numero = :numero)
+            ORDER BY bm25(frases_fts) LIMIT :limit""", args)
+    return pool.fetchall("""
+        SELECT r.numero, f.autor, f.texto
+        FROM frases f JOIN rounds r ON r.id = f.round_id
+        WHERE r.status = 'closed'
+          AND (:autor IS NULL OR f.autor = :autor) AND (:numero IS NULL OR r.numero = :numero)
+        ORDER BY f.id DESC LIMIT :limit""", args)
+
+
+def duplicate_in_round(c, round_id, texto):
+    """(autor, texto) de una frase de la ronda igual a texto una vez normalizadas, o None."""
+    return c.execute("SELECT autor, texto FROM frases WHERE texto_hash=? AND round_id=? LIMIT 1",
+                     (textnorm.phrase_hash(texto), round_id)).fetchone()
+
+
+def repeated(pool, round_id):
+    """[(frase, autor, ronda original, autor original)] de la ronda que ya se enviaron antes."""
+    return pool.fetchall("""
+        SELECT f.texto, f.autor, r.numero, o.autor
+        FROM frases f
+        JOIN frases o ON o.id = (SELECT MIN(p.id) FROM frases p
+                                 WHERE p.texto_hash = f.texto_hash AND p.round_id <> f.round_id)
+        JOIN rounds r ON r.id = o.round_id
+        WHERE f.round_id = ?
+        ORDER BY f.id""", (round_id,))
@@ -0,0 +1,74 @@
+# Caché de ajustes
+# =============================================================================
+# Los ajustes se cargan en una sola consulta y se sirven desde memoria ya
+# tipados (enteros para recompensas y current_round). set() escribe en la base
+# e invalida la caché: si se llama dentro de una transacción que luego se
+# deshace, la siguiente lectura recarga lo que de verdad quedó guardado. Para
+# enterarse de cambios hechos por otros procesos
+# se compara, como mucho una vez cada CHECK_INTERVAL segundos, el contador
+# data_versions['settings'] que mantienen los triggers de la tabla settings.
+# =============================================================================
+import threading
+import time
+
+DEFAULTS = {
+  "titulo": "TWOWTE – Reality de Frases",
+  "current_round": "1",
+  "reward_first": "10",
+  "reward_second": "7",
+  "reward_third": "5",
+  "reward_45": "3",
+  "reward_participate": "1",
+  "live_interval": "0",
+  "ballot_top_k": "0"
+}
+INT_KEYS = {"current_round", "reward_first", "reward_second", "reward_third", "reward_45", "reward_participate", "live_interval", "ballot_top_k"}
+CHECK_INTERVAL = 1.0
+
+
+def _typed(k, v):
+    return int(v) if k in INT_KEYS else v
+
+
+class Settings:
+    def __init__(self, pool):
+        self.pool = pool
+        self._values = {}
+        self._version = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        row = self.pool.fetchone("SELECT v FROM data_versions WHERE clave='settings'")
+        return row[0] if row else 0
+
+    def reload(self):
+        with self._lock:
+            with self.pool.connection() as c:
+                version = c.execute("SELECT v FROM data_versions WHERE clave='settings'").fetchone()
+                rows = c.execute("SELECT clave, valor FROM settings").fetchall()
+                en_tx = c.in_transaction
+            self._values = {k: _typed(k, v) for k, v in rows}
+            # leído dentro de una transacción aún sin confirmar: vale para esta
+            # lectura, pero la siguiente vuelve a la base
+            self._version = None if en_tx else (version[0] if version else 0)
+            self._checked = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._version is None:
+            self.reload()
+        elif time.monotonic() - self._checked >= CHECK_INTERVAL:
+            if self._current_version() != self._version:
+                self.reload()
+            else:
+                self._checked = time.monotonic()
+
+    def get(self, k):
+        self._ensure_fresh()
+        return self._values[k]
+
+    def set(self, k, v):
+        # se une a la transacción abierta en el hilo, si la hay
+        self.pool.execute("REPLACE INTO settings VALUES(?,?)", (k, str(v)))
+        # no se copia v a la caché: la transacción aún puede deshacerse
+        self._version = None
@@ -0,0 +1,13 @@
+# Tienda
+# =============================================================================
+# Precios y efectos de los objetos. Los comparten la app (pestaña Tienda), el
+# generador de temporadas de bench.py y el simulador (simulate.py), así que
+# cambiar un precio aquí cambia las tres cosas a la vez.
+# =============================================================================
+SHOP = {"Doble Respuesta": 10, "Triple Respuesta": 25, "Desempate Favorable": 8, "Ruleta del Tigre": 9, "Duplicador de Monedas": 12}
+
+# respuestas extra que da cada objeto en la ronda en que se compra
+EXTRA_RESPONSES = {"Doble Respuesta": 1, "Triple Respuesta": 2}
+# la Ruleta del Tigre: el comprador nombra a dos jugadores y uno de los tres,
+# al azar, pierde estas monedas
+RULETA_PENALTY = 3
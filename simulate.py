@@ -0,0 +1,211 @@
+# Simulador de temporadas
+# =============================================================================
+# Juega temporadas sintéticas con las reglas reales, sin base de datos ni
+# Streamlit: el recuento, los desempates DF/STD y las papeletas parciales son
+# los de scoring.tally, los premios y el eliminado salen de scoring.payouts y
+# scoring.eliminated, y los precios y efectos de la tienda de shop.py.
+#
+# Modelo: cada jugador tiene una habilidad ~ N(0, skill_sd); cada frase vale
+# habilidad + N(0, phrase_sd) y cada juez la percibe con ruido N(0, judge_sd).
+# Cada ronda, cada jugador activo compra con probabilidad buy_rate un objeto
+# al azar entre los que puede pagar. La temporada acaba con un superviviente.
+#
+# Por configuración se informa de:
+#   • inflación: monedas netas creadas por ronda y % que vuelve a la tienda;
+#   • eliminaciones: rondas por temporada, correlación habilidad/supervivencia
+#     y en qué punto de la temporada (%) caen los del cuartil más hábil;
+#   • sesgo de victorias: cuántas gana el más hábil y el cuartil más hábil.
+#
+#   python simulate.py --seasons 2000
+#   python simulate.py --grid reward_first=5,10,15 --grid "Duplicador de Monedas=8,12,16"
+# =============================================================================
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import scoring
+import settings
+import shop
+
+REWARDS = ["reward_first", "reward_second", "reward_third", "reward_45", "reward_participate"]
+PARAMS = {"players": 12, "judges": 5, "top_k": 0, "buy_rate": 0.5,
+          "skill_sd": 1.0, "phrase_sd": 1.0, "judge_sd": 1.0, "max_rounds": 500}
+CHUNK = 250  # temporadas por tarea del pool de procesos
+
+
+def base_config():
+    """Recompensas por defecto de la app, precios de la tienda y parámetros del modelo."""
+    cfg = {k: int(settings.DEFAULTS[k]) for k in REWARDS}
+    cfg.update(shop.SHOP)
+    cfg.update(PARAMS)
+    return cfg
+
+
+def season(cfg, rng):
+    """Una temporada. Devuelve sus métricas en bruto."""
+    P, J = cfg["players"], cfg["judges"]
+    prices = {it: cfg[it] for it in shop.SHOP}
+    recomp = [cfg["reward_first"], cfg["reward_second"], cfg["reward_third"], cfg["reward_45"], cfg["reward_45"]]
+    skill = rng.normal(0.0, cfg["skill_sd"], P)
+    coins = np.zeros(P)
+    alive = np.ones(P, dtype=bool)
+    out_round = np.zeros(P)
+    minted = spent = 0.0
+    r = 0
+    while alive.sum() > 1 and r < cfg["max_rounds"]:
+        act = np.flatnonzero(alive)
+        n = len(act)
+        resp = np.ones(n, dtype=np.int64)
+        df = np.zeros(n, dtype=np.int64)
+        mult = {}
+        for i in np.flatnonzero(rng.random(n) < cfg["buy_rate"]):
+            p = act[i]
+            items = [it for it, pr in prices.items() if coins[p] >= pr]
+            if not items:
+                continue
+            it = items[rng.integers(len(items))]
+            coins[p] -= prices[it]
+            spent += prices[it]
+            if it in shop.EXTRA_RESPONSES:
+                resp[i] += shop.EXTRA_RESPONSES[it]
+            elif it == "Desempate Favorable":
+                df[i] = 1
+            elif it == "Duplicador de Monedas":
+                mult[i] = 2
+            elif it == "Ruleta del Tigre" and n >= 3:
+                otros = rng.choice(np.delete(act, i), 2, replace=False)
+                loser = rng.choice([p, *otros])
+                coins[loser] -= shop.RULETA_PENALTY
+                spent += shop.RULETA_PENALTY
+
+        autor = np.repeat(np.arange(n), resp)      # autor (índice en act) de cada frase
+        N = len(autor)
+        calidad = skill[act][autor] + rng.normal(0.0, cfg["phrase_sd"], N)
+        percibida = calidad[None, :] + rng.normal(0.0, cfg["judge_sd"], (J, N))
+        puesto = np.argsort(np.argsort(-percibida, axis=1), axis=1) + 1
+        k = cfg["top_k"]
+        juez, frase = np.nonzero(puesto <= k) if k and k < N else np.indices((J, N)).reshape(2, -1)
+        _, _, orden = scoring.tally(N, frase, puesto[juez, frase].astype(np.float64), juez,
+                                    np.zeros(N, dtype=np.int64), df[autor])
+
+        res = {"orden": autor[orden].tolist(), "mult": mult}
+        for monto, i in scoring.payouts(res, recomp, cfg["reward_participate"]):
+            coins[act[i]] += monto
+            minted += monto
+        eliminado = act[scoring.eliminated(res)]
+        alive[eliminado] = False
+        out_round[eliminado] = r
+        r += 1
+    out_round[alive] = r + 1                        # el ganador sobrevive a todos
+    ganador = int(np.argmax(out_round))
+    orden_skill = np.argsort(np.argsort(-skill))    # 0 = el más hábil
+    q1 = orden_skill < max(1, P // 4)
+    return {
+        "rounds": r,
+        "minted": minted,
+        "spent": spent,
+        "win_top": float(orden_skill[ganador] == 0),
+        "win_top_q": float(q1[ganador]),
+        "q1_life": float(np.minimum(out_round[q1], r).mean() / r) if r else 1.0,
+        "skill_corr": float(np.corrcoef(skill, out_round)[0, 1]) if P > 2 else 0.0,
+    }
+
+
+def run_chunk(job):
+    cfg, n, seed = job
+    rng = np.random.default_rng(seed)
+    acc = {}
+    for _ in range(n):
+        for k, v in season(cfg, rng).items():
+            acc[k] = acc.get(k, 0.0) + v
+    return acc, n
+
+
+def summarize(cfg, acc, n):
+    rounds = acc["rounds"]
+    return {
+        "seasons": n,
+        "rondas": round(rounds / n, 2),
+        "creadas/ronda": round((acc["minted"] - acc["spent"]) / rounds, 2) if rounds else 0.0,
+        "gastado %": round(100 * acc["spent"] / acc["minted"], 1) if acc["minted"] else 0.0,
+        "corr habilidad": round(acc["skill_corr"] / n, 3),
+        "vida Q1 %": round(100 * acc["q1_life"] / n, 1),
+        "gana el mejor %": round(100 * acc["win_top"] / n, 1),
+        "gana Q1 %": round(100 * acc["win_top_q"] / n, 1),
+        "azar %": round(100 / cfg["players"], 1),
+    }
+
+
+def sweep(grid, seasons=2000, workers=None, seed=0, base=None):
+    """Simula cada combinación de grid ({clave: [valores]}). Devuelve [(cambios, métricas)]."""
+    base = base or base_config()
+    keys = list(grid)
+    combos = [dict(zip(keys, vals)) for vals in itertools.product(*(grid[k] for k in keys))] or [{}]
+    jobs, owner = [], []
+    for c, combo in enumerate(combos):
+        cfg = {**base, **combo}
+        for s in range(0, seasons, CHUNK):
+            jobs.append((cfg, min(CHUNK, seasons - s), [seed, c, s]))
+            owner.append(c)
+    totals = [({}, 0) for _ in combos]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        for c, (acc, n) in zip(owner, ex.map(run_chunk, jobs)):
+            tot, m = totals[c]
+            for k, v in acc.items():
+                tot[k] = tot.get(k, 0.0) + v
+            totals[c] = (tot, m + n)
+    return [(combo, summarize({**base, **combo}, acc, n)) for combo, (acc, n) in zip(combos, totals)]
+
+
+def _value(s):
+    try:
+        return int(s)
+    except ValueError:
+        return float(s)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Simulador de temporadas de TWOWTE")
+    ap.add_argument("--seasons", type=int, default=2000, help="temporadas por configuración")
+    ap.add_argument("--grid", action="append", default=[], metavar="CLAVE=v1,v2",
+                    help="valores a barrer: recompensas (reward_first…), precios (nombre del objeto) o parámetros del modelo")
+    ap.add_argument("--set", action="append", default=[], metavar="CLAVE=v", help="fija un valor de la configuración base")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", help="guarda los resultados en este fichero")
+    args = ap.parse_args(argv)
+
+    base = base_config()
+    for item in args.set:
+        k, v = item.split("=", 1)
+        if k not in base:
+            ap.error(f"clave desconocida: {k}")
+        base[k] = _value(v)
+    grid = {}
+    for item in args.grid:
+        k, vs = item.split("=", 1)
+        if k not in base:
+            ap.error(f"clave desconocida: {k}")
+        grid[k] = [_value(v) for v in vs.split(",")]
+
+    t0 = time.perf_counter()
+    rows = sweep(grid, args.seasons, args.workers, args.seed, base)
+    dt_s = time.perf_counter() - t0
+    cols = list(rows[0][1])
+    print("  ".join(f"{c:>16}" for c in list(grid) + cols))
+    for combo, m in rows:
+        print("  ".join(f"{str(v):>16}" for v in list(combo.values()) + [m[c] for c in cols]))
+    print(f"{len(rows)} configuraciones × {args.seasons} temporadas en {dt_s:.1f} s")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"base": base, "results": [{"config": c, **m} for c, m in rows]}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
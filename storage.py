@@ -0,0 +1,679 @@
+# Almacenamiento del juego
+# =============================================================================
+# Operaciones del juego (usuarios, ajustes, rondas, frases, papeletas,
+# player_round y compras) detrás de una interfaz con dos motores:
+#   • SQLiteStorage: el de la app, sobre un db.Pool ya migrado; reutiliza
+#     ballots.submit_ballot, ledger.apply y la huella de textnorm, así que las
+#     escrituras son las mismas que hacía la app con SQL directo.
+#   • MemoryStorage: registros con __slots__ e índices en dicts, sin E/S, para
+#     pruebas y benchmarks que no necesitan una base en disco.
+#
+# Los dos deben pasar conformance(); `python storage.py` la ejecuta sobre
+# ambos y compara el coste por operación. tx() agrupa varias operaciones: en
+# SQLite es pool.tx(); en memoria sólo serializa (cada operación valida antes
+# de tocar nada, así que no deja estados a medias, pero no hay rollback).
+# =============================================================================
+import abc
+import argparse
+import datetime as dt
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import ballots
+import db
+import directory
+import ledger
+import rounds
+import schema
+import search
+import textnorm
+
+# posiciones en cada fila de player()
+RESPONSES, DF_FLAG, MULTIPLIER, PENALTY = range(4)
+
+
+def _now():
+    return dt.datetime.utcnow().isoformat()
+
+
+class Storage(abc.ABC):
+    """Interfaz común. Filas como tuplas, en el mismo formato que las consultas de la app."""
+
+    @abc.abstractmethod
+    def tx(self):
+        """Contexto que agrupa varias operaciones en una transacción."""
+
+    # --- usuarios ---
+    @abc.abstractmethod
+    def add_user(self, username, password, role, is_admin=0):
+        """Alta con 0 monedas. False si ya existe."""
+
+    @abc.abstractmethod
+    def user(self, username):
+        """(username, role, is_admin, coins, active) o None."""
+
+    @abc.abstractmethod
+    def users(self):
+        """Todas las filas de user(), en orden de alta."""
+
+    @abc.abstractmethod
+    def login(self, username, password):
+        """(is_admin,) si las credenciales son válidas y la cuenta está activa; si no, None."""
+
+    @abc.abstractmethod
+    def set_active(self, username, active):
+        """Activa (1) o desactiva (0) la cuenta."""
+
+    @abc.abstractmethod
+    def add_coins(self, entries):
+        """Anota y aplica [(username, round_id, delta, motivo)] (ver ledger.apply)."""
+
+    # --- ajustes ---
+    @abc.abstractmethod
+    def setting(self, clave):
+        """Valor en texto, o None."""
+
+    @abc.abstractmethod
+    def set_setting(self, clave, valor):
+        """Guarda el valor como texto."""
+
+    # --- rondas ---
+    @abc.abstractmethod
+    def new_round(self, numero):
+        """Abre una ronda con todos los usuarios activos en player_round. Devuelve su id."""
+
+    @abc.abstractmethod
+    def open_round(self):
+        """(id, numero) de la ronda abierta más reciente, o None."""
+
+    @abc.abstractmethod
+    def round_status(self, round_id):
+        """'open', 'closed' o None si no existe."""
+
+    @abc.abstractmethod
+    def close_round(self, round_id):
+        """Compare-and-swap open -> closed. True si esta llamada la cerró."""
+
+    @abc.abstractmethod
+    def ready(self, round_id):
+        """¿Hay frases y han votado todos los jueces activos?"""
+
+    # --- player_round ---
+    @abc.abstractmethod
+    def add_player(self, round_id, username):
+        """Inscribe al usuario con una respuesta. False si ya estaba o la ronda no existe."""
+
+    @abc.abstractmethod
+    def player(self, round_id, username):
+        """(responses_left, df_flag, multiplier, penalty) o None."""
+
+    @abc.abstractmethod
+    def adjust_player(self, round_id, username, responses=0, penalty=0, df_flag=None, multiplier=None):
+        """Suma responses/penalty y fija df_flag/multiplier si se dan."""
+
+    # --- frases ---
+    @abc.abstractmethod
+    def duplicate(self, round_id, texto):
+        """(autor, texto) de una frase de la ronda igual a texto una vez normalizadas, o None."""
+
+    @abc.abstractmethod
+    def add_phrase(self, round_id, autor, texto):
+        """Id de la frase, o None si la ronda no está abierta, al autor no le quedan
+        respuestas o la frase ya está en la ronda. Gasta una respuesta."""
+
+    @abc.abstractmethod
+    def phrases(self, round_id):
+        """[(id, texto, autor)] de la ronda, por id."""
+
+    # --- papeletas ---
+    @abc.abstractmethod
+    def submit_ballot(self, round_id, juez, frase_ids):
+        """Sustituye la papeleta del juez (frase_ids de mejor a peor).
+
+        False, sin escribir nada, si la ronda no existe o no está abierta, o si
+        frase_ids repite una frase o incluye alguna que no es de la ronda.
+        """
+
+    @abc.abstractmethod
+    def ballot(self, round_id, juez):
+        """[frase_id] de la papeleta, de mejor a peor, o None si no ha votado."""
+
+    @abc.abstractmethod
+    def ballot_count(self, round_id):
+        """Jueces que han votado en la ronda."""
+
+    @abc.abstractmethod
+    def votes(self, round_id):
+        """[(juez, frase_id, posicion)] ordenados por juez y posición."""
+
+    # --- compras ---
+    @abc.abstractmethod
+    def add_purchase(self, round_id, username, item, meta=None):
+        """Id de la compra, o None si la ronda no existe."""
+
+    @abc.abstractmethod
+    def purchases(self, round_id):
+        """[(username, item, meta)] de la ronda, en orden de compra."""
+
+
+###############################################################################
+# SQLite                                                                      #
+###############################################################################
+class SQLiteStorage(Storage):
+    def __init__(self, pool):
+        self.pool = pool
+
+    def tx(self):
+        return self.pool.tx()
+
+    def add_user(self, username, password, role, is_admin=0):
+        with self.pool.tx() as c:
+            return c.execute("INSERT OR IGNORE INTO users VALUES(?,?,?,?,?,?)",
+                             (username, password, role, is_admin, 0, 1)).rowcount == 1
+
+    def user(self, username):
+        return self.pool.fetchone("SELECT username, role, is_admin, coins, active FROM users WHERE username=?", (username,))
+
+    def users(self):
+        return self.pool.fetchall("SELECT username, role, is_admin, coins, active FROM users ORDER BY rowid")
+
+    def login(self, username, password):
+        return directory.login(self.pool, username, password)
+
+    def set_active(self, username, active):
+        self.pool.execute("UPDATE users SET active=? WHERE username=?", (int(active), username))
+
+    def add_coins(self, entries):
+        with self.pool.tx() as c:
+            ledger.apply(c, entries)
+
+    def setting(self, clave):
+        row = self.pool.fetchone("SELECT valor FROM settings WHERE clave=?", (clave,))
+        return row[0] if row else None
+
+    def set_setting(self, clave, valor):
+        self.pool.execute("REPLACE INTO settings VALUES(?,?)", (clave, str(valor)))
+
+    def new_round(self, numero):
+        with self.pool.tx() as c:
+            rid = c.execute("INSERT INTO rounds(numero,status,created_at) VALUES(?,?,?)", (numero, 'open', _now())).lastrowid
+            c.execute("INSERT INTO player_round(round_id,username,responses_left) SELECT ?, username, 1 FROM users WHERE active=1",
+                      (rid,))
+        return rid
+
+    def open_round(self):
+        return self.pool.fetchone("SELECT id, numero FROM rounds WHERE status='open' ORDER BY numero DESC LIMIT 1")
+
+    def round_status(self, round_id):
+        row = self.pool.fetchone("SELECT status FROM rounds WHERE id=?", (round_id,))
+        return row[0] if row else None
+
+    def close_round(self, round_id):
+        with self.pool.tx() as c:
+            return c.execute("UPDATE rounds SET status='closed' WHERE id=? AND status='open'", (round_id,)).rowcount == 1
+
+    def ready(self, round_id):
+        return rounds.ready(self.pool, round_id)
+
+    def add_player(self, round_id, username):
+        with self.pool.tx() as c:
+            if self.round_status(round_id) is None:
+                return False
+            return c.execute("INSERT OR IGNORE INTO player_round(round_id, username, responses_left) VALUES(?,?,1)",
+                             (round_id, username)).rowcount == 1
+
+    def player(self, round_id, username):
+        return self.pool.fetchone("SELECT responses_left, df_flag, multiplier, penalty FROM player_round WHERE round_id=? AND username=?",
+                                  (round_id, username))
+
+    def adjust_player(self, round_id, username, responses=0, penalty=0, df_flag=None, multiplier=None):
+        self.pool.execute("""
+            UPDATE player_round SET responses_left = responses_left + :resp, penalty = penalty + :pen,
+                   df_flag = COALESCE(:df, df_flag), multiplier = COALESCE(:mult, multiplier)
+            WHERE round_id=:r AND username=:u""",
+                          {"resp": responses, "pen": penalty, "df": df_flag, "mult": multiplier, "r": round_id, "u": username})
+
+    def duplicate(self, round_id, texto):
+        with self.pool.connection() as c:
+            return search.duplicate_in_round(c, round_id, texto)
+
+    def add_phrase(self, round_id, autor, texto):
+        texto = texto.strip()
+        with self.pool.tx() as c:
+            if self.round_status(round_id) != 'open' or self.duplicate(round_id, texto):
+                return None
+            if c.execute("UPDATE player_round SET responses_left = responses_left - 1 "
+                         "WHERE round_id=? AND username=? AND responses_left > 0", (round_id, autor)).rowcount != 1:
+                return None
+            return c.execute("INSERT INTO frases(texto, autor, round_id) VALUES(?,?,?)", (texto, autor, round_id)).lastrowid
+
+    def phrases(self, round_id):
+        return self.pool.fetchall("SELECT id, texto, autor FROM frases WHERE round_id=? ORDER BY id", (round_id,))
+
+    def submit_ballot(self, round_id, juez, frase_ids):
+        with self.pool.tx() as c:
+            return ballots.submit_ballot(c, juez, round_id, frase_ids)
+
+    def ballot(self, round_id, juez):
+        if not ballots.has_voted(self.pool, juez, round_id):
+            return None
+        return [f for (f,) in self.pool.fetchall("""
+            SELECT v.frase_id FROM votos v JOIN frases f ON f.id = v.frase_id
+            WHERE v.juez=? AND f.round_id=? ORDER BY v.posicion""", (juez, round_id))]
+
+    def ballot_count(self, round_id):
+        return ballots.judges_voted(self.pool, round_id)
+
+    def votes(self, round_id):
+        return self.pool.fetchall("""
+            SELECT v.juez, v.frase_id, v.posicion FROM votos v JOIN frases f ON f.id = v.frase_id
+            WHERE f.round_id=? ORDER BY v.juez, v.posicion""", (round_id,))
+
+    def add_purchase(self, round_id, username, item, meta=None):
+        with self.pool.tx() as c:
+            if self.round_status(round_id) is None:
+                return None
+            return c.execute("INSERT INTO purchases(round_id, username, item, meta) VALUES(?,?,?,?)",
+                             (round_id, username, item, meta)).lastrowid
+
+    def purchases(self, round_id):
+        return self.pool.fetchall("SELECT username, item, meta FROM purchases WHERE round_id=? ORDER BY id", (round_id,))
+
+
+###############################################################################
+# Memoria                                                                     #
+###############################################################################
+class _User:
+    __slots__ = ("username", "password", "role", "is_admin", "coins", "active")
+
+    def __init__(self, username, password, role, is_admin):
+        self.username, self.password, self.role, self.is_admin = username, password, role, is_admin
+        self.coins = 0
+        self.active = 1
+
+    def row(self):
+        return (self.username, self.role, self.is_admin, self.coins, self.active)
+
+
+class _Round:
+    __slots__ = ("numero", "status", "created_at", "frases", "ids", "hashes", "papeletas", "compras", "jugadores")
+
+    def __init__(self, numero):
+        self.numero = numero
+        self.status = 'open'
+        self.created_at = _now()
+        self.frases = []        # [(id, texto, autor)]
+        self.ids = set()        # ids de frases, para validar papeletas
+        self.hashes = {}        # huella -> índice en frases
+        self.papeletas = {}     # juez -> (hora, tupla de frase_ids)
+        self.compras = []       # [(id, username, item, meta)]
+        self.jugadores = {}     # username -> _Player
+
+
+class _Player:
+    __slots__ = ("responses_left", "df_flag", "multiplier", "penalty")
+
+    def __init__(self):
+        self.responses_left, self.df_flag, self.multiplier, self.penalty = 1, 0, 1, 0
+
+    def row(self):
+        return (self.responses_left, self.df_flag, self.multiplier, self.penalty)
+
+
+class MemoryStorage(Storage):
+    def __init__(self):
+        self._users = {}
+        self._settings = {}
+        self._rounds = {}
+        self._next = {"round": 1, "frase": 1, "compra": 1}
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def tx(self):
+        with self._lock:
+            yield self
+
+    def _id(self, kind):
+        n = self._next[kind]
+        self._next[kind] = n + 1
+        return n
+
+    def add_user(self, username, password, role, is_admin=0):
+        with self._lock:
+            if username in self._users:
+                return False
+            self._users[username] = _User(username, password, role, is_admin)
+            return True
+
+    def user(self, username):
+        u = self._users.get(username)
+        return u.row() if u else None
+
+    def users(self):
+        return [u.row() for u in self._users.values()]
+
+    def login(self, username, password):
+        u = self._users.get(username)
+        return (u.is_admin,) if u and u.active and u.password == password else None
+
+    def set_active(self, username, active):
+        u = self._users.get(username)
+        if u:
+            u.active = int(active)
+
+    def add_coins(self, entries):
+        with self._lock:
+            for username, _, delta, _ in entries:
+                u = self._users.get(username)
+                if u:
+                    u.coins += delta
+
+    def setting(self, clave):
+        return self._settings.get(clave)
+
+    def set_setting(self, clave, valor):
+        self._settings[clave] = str(valor)
+
+    def new_round(self, numero):
+        with self._lock:
+            rid = self._id("round")
+            r = self._rounds[rid] = _Round(numero)
+            for u in self._users.values():
+                if u.active:
+                    r.jugadores[u.username] = _Player()
+            return rid
+
+    def open_round(self):
+        abiertas = [(r.numero, rid) for rid, r in self._rounds.items() if r.status == 'open']
+        if not abiertas:
+            return None
+        numero, rid = max(abiertas)
+        return (rid, numero)
+
+    def round_status(self, round_id):
+        r = self._rounds.get(round_id)
+        return r.status if r else None
+
+    def close_round(self, round_id):
+        with self._lock:
+            r = self._rounds.get(round_id)
+            if not r or r.status != 'open':
+                return False
+            r.status = 'closed'
+            return True
+
+    def ready(self, round_id):
+        r = self._rounds.get(round_id)
+        need = sum(1 for u in self._users.values() if u.role == 'juez' and u.active)
+        return bool(r and r.frases and len(r.papeletas) >= need)
+
+    def add_player(self, round_id, username):
+        with self._lock:
+            r = self._rounds.get(round_id)
+            if r is None or username in r.jugadores:
+                return False
+            r.jugadores[username] = _Player()
+            return True
+
+    def player(self, round_id, username):
+        r = self._rounds.get(round_id)
+        p = r.jugadores.get(username) if r else None
+        return p.row() if p else None
+
+    def adjust_player(self, round_id, username, responses=0, penalty=0, df_flag=None, multiplier=None):
+        with self._lock:
+            r = self._rounds.get(round_id)
+            p = r.jugadores.get(username) if r else None
+            if p is None:
+                return
+            p.responses_left += responses
+            p.penalty += penalty
+            if df_flag is not None:
+                p.df_flag = df_flag
+            if multiplier is not None:
+                p.multiplier = multiplier
+
+    def duplicate(self, round_id, texto):
+        r = self._rounds.get(round_id)
+        i = r.hashes.get(textnorm.phrase_hash(texto)) if r else None
+        return (r.frases[i][2], r.frases[i][1]) if i is not None else None
+
+    def add_phrase(self, round_id, autor, texto):
+        texto = texto.strip()
+        with self._lock:
+            r = self._rounds.get(round_id)
+            if r is None or r.status != 'open':
+                return None
+            p = r.jugadores.get(autor)
+            h = textnorm.phrase_hash(texto)
+            if p is None or p.responses_left <= 0 or h in r.hashes:
+                return None
+            p.responses_left -= 1
+            fid = self._id("frase")
+            r.hashes[h] = len(r.frases)
+            r.frases.append((fid, texto, autor))
+            r.ids.add(fid)
+            return fid
+
+    def phrases(self, round_id):
+        r = self._rounds.get(round_id)
+        return list(r.frases) if r else []
+
+    def submit_ballot(self, round_id, juez, frase_ids):
+        with self._lock:
+            r = self._rounds.get(round_id)
+            if r is None or r.status != 'open':
+                return False
+            ids = tuple(frase_ids)
+            if len(set(ids)) != len(ids) or not r.ids.issuperset(ids):
+                return False
+            r.papeletas[juez] = (_now(), ids)
+            return True
+
+    def ballot(self, round_id, juez):
+        r = self._rounds.get(round_id)
+        b = r.papeletas.get(juez) if r else None
+        return list(b[1]) if b else None
+
+    def ballot_count(self, round_id):
+        r = self._rounds.get(round_id)
+        return len(r.papeletas) if r else 0
+
+    def votes(self, round_id):
+        r = self._rounds.get(round_id)
+        if r is None:
+            return []
+        return [(juez, fid, pos) for juez in sorted(r.papeletas) for pos, fid in enumerate(r.papeletas[juez][1], 1)]
+
+    def add_purchase(self, round_id, username, item, meta=None):
+        with self._lock:
+            r = self._rounds.get(round_id)
+            if r is None:
+                return None
+            pid = self._id("compra")
+            r.compras.append((pid, username, item, meta))
+            return pid
+
+    def purchases(self, round_id):
+        r = self._rounds.get(round_id)
+        return [(u, item, meta) for _, u, item, meta in r.compras] if r else []
+
+
+###############################################################################
+# Conformidad                                                                 #
+###############################################################################
+def conformance(make):
+    """Ejecuta la batería común sobre make() (un almacenamiento vacío). Devuelve nº de comprobaciones.
+
+    Lanza AssertionError con la primera discrepancia.
+    """
+    s = make()
+    n = 0
+
+    def check(cond, msg):
+        nonlocal n
+        n += 1
+        if not cond:
+            raise AssertionError(f"{type(s).__name__}: {msg}")
+
+    # usuarios y monedas
+    check(s.add_user("admin", "pw", "juez", 1), "alta de admin")
+    check(not s.add_user("admin", "otra", "jugador"), "alta duplicada rechazada")
+    for u in ("ana", "beto", "caro"):
+        s.add_user(u, "pw", "jugador")
+    s.add_user("juez1", "pw", "juez")
+    check([r[0] for r in s.users()] == ["admin", "ana", "beto", "caro", "juez1"], "orden de alta")
+    check(s.user("ana") == ("ana", "jugador", 0, 0, 1), "fila de usuario")
+    check(s.user("nadie") is None, "usuario inexistente")
+    check(s.login("admin", "pw") == (1,) and s.login("admin", "mal") is None, "login")
+    s.add_coins([("ana", None, 10, ledger.AJUSTE), ("ana", None, -3, ledger.COMPRA), ("beto", None, 0, ledger.AJUSTE)])
+    check(s.user("ana")[3] == 7 and s.user("beto")[3] == 0, "monedas")
+
+    # ajustes
+    check(s.setting("titulo") is None, "ajuste ausente")
+    s.set_setting("current_round", 3)
+    check(s.setting("current_round") == "3", "ajustes en texto")
+
+    # rondas y player_round
+    s.set_active("caro", 0)
+    check(s.login("caro", "pw") is None, "login de inactivo")
+    check(s.open_round() is None, "sin ronda abierta")
+    rid = s.new_round(1)
+    check(s.open_round() == (rid, 1) and s.round_status(rid) == 'open', "ronda abierta")
+    check(s.player(rid, "ana") == (1, 0, 1, 0), "inscripción de activos")
+    check(s.player(rid, "caro") is None, "inactivos fuera de la ronda")
+    check(s.add_player(rid, "caro") and not s.add_player(rid, "caro"), "add_player idempotente")
+    s.adjust_player(rid, "ana", responses=1, penalty=2, df_flag=1)
+    s.adjust_player(rid, "beto", multiplier=2)
+    check(s.player(rid, "ana") == (2, 1, 1, 2) and s.player(rid, "beto") == (1, 0, 2, 0), "ajustes de jugador")
+
+    # frases
+    f1 = s.add_phrase(rid, "ana", "  Hola, mundo ")
+    check(f1 is not None, "frase aceptada")
+    check(s.duplicate(rid, "hola MUNDO!") == ("ana", "Hola, mundo"), "duplicado normalizado")
+    check(s.add_phrase(rid, "ana", "HOLA mundo") is None, "duplicado rechazado")
+    f2 = s.add_phrase(rid, "ana", "Adiós")
+    check(f2 is not None and s.player(rid, "ana")[RESPONSES] == 0, "gasta respuestas")
+    check(s.add_phrase(rid, "ana", "Otra") is None, "sin respuestas")
+    check(s.add_phrase(rid, "nadie", "Otra") is None, "autor fuera de la ronda")
+    f3 = s.add_phrase(rid, "beto", "Tercera")
+    check(s.phrases(rid) == [(f1, "Hola, mundo", "ana"), (f2, "Adiós", "ana"), (f3, "Tercera", "beto")], "frases de la ronda")
+
+    # papeletas
+    check(not s.ready(rid) and s.ballot(rid, "admin") is None, "sin votos")
+    check(s.submit_ballot(rid, "admin", [f2, f1]), "papeleta parcial")
+    check(s.submit_ballot(rid, "admin", [f3, f1, f2]), "papeleta sustituida")
+    check(s.ballot(rid, "admin") == [f3, f1, f2] and s.ballot_count(rid) == 1, "papeleta leída")
+    check(not s.submit_ballot(rid, "admin", [f1, f1]), "papeleta con frases repetidas")
+    check(not s.submit_ballot(rid, "admin", [f1, 999]), "papeleta con una frase inexistente")
+    check(not s.submit_ballot(10**6, "admin", [f1]), "papeleta de una ronda inexistente")
+    check(s.ballot(rid, "admin") == [f3, f1, f2], "una papeleta rechazada no toca la anterior")
+    s.submit_ballot(rid, "juez1", [f1])
+    check(s.votes(rid) == [("admin", f3, 1), ("admin", f1, 2), ("admin", f2, 3), ("juez1", f1, 1)], "votos")
+    check(s.ready(rid), "ronda lista")
+
+    # compras
+    s.add_purchase(rid, "ana", "Doble Respuesta")
+    s.add_purchase(rid, "beto", "Ruleta del Tigre", "ana|caro")
+    check(s.purchases(rid) == [("ana", "Doble Respuesta", None), ("beto", "Ruleta del Tigre", "ana|caro")], "compras")
+    check(s.add_purchase(10**6, "ana", "Doble Respuesta") is None and s.purchases(10**6) == [], "compra en ronda inexistente")
+    check(not s.add_player(10**6, "ana") and s.player(10**6, "ana") is None, "inscripción en ronda inexistente")
+
+    # cierre y ronda siguiente
+    with s.tx():
+        check(s.close_round(rid), "cierre")
+    check(not s.close_round(rid) and s.round_status(rid) == 'closed', "cierre una sola vez")
+    check(not s.submit_ballot(rid, "juez1", [f2]) and s.add_phrase(rid, "beto", "Tarde") is None, "ronda cerrada")
+    s.set_active("ana", 0)
+    rid2 = s.new_round(2)
+    check(rid2 != rid and s.open_round() == (rid2, 2), "nueva ronda")
+    check(s.player(rid2, "ana") is None and s.player(rid2, "beto") == (1, 0, 1, 0), "inscritos de la nueva ronda")
+    g1 = s.add_phrase(rid2, "beto", "Hola mundo")
+    check(g1 is not None, "el duplicado es por ronda")
+    check(not s.submit_ballot(rid2, "admin", [g1, f1]), "papeleta con una frase de otra ronda")
+    check(s.submit_ballot(rid2, "admin", [g1]) and s.votes(rid2) == [("admin", g1, 1)], "papeleta de la nueva ronda")
+    check(s.round_status(10**6) is None and s.phrases(10**6) == [], "ronda inexistente")
+    return n
+
+
+def _sqlite_factory(folder):
+    count = [0]
+
+    def make():
+        count[0] += 1
+        pool = db.Pool(os.path.join(folder, f"conformance{count[0]}.db"))
+        schema.migrate(pool)
+        return SQLiteStorage(pool)
+    return make
+
+
+def _workload(s, rounds_, players, judges):
+    """Temporada sintética por la interfaz: devuelve el nº de operaciones hechas."""
+    ops = 0
+    for i in range(players):
+        s.add_user(f"j{i}", "pw", "jugador")
+    for i in range(judges):
+        s.add_user(f"z{i}", "pw", "juez")
+    ops += players + judges
+    for n in range(1, rounds_ + 1):
+        rid = s.new_round(n)
+        ops += 1
+        for i in range(players):
+            s.add_phrase(rid, f"j{i}", f"frase {n} de {i}")
+            s.player(rid, f"j{i}")
+        ids = [f[0] for f in s.phrases(rid)]
+        ops += 2 * players + 1
+        for k in range(judges):
+            s.submit_ballot(rid, f"z{k}", ids[k:] + ids[:k])
+        s.add_coins([(f"j{i}", rid, 1, ledger.PREMIO) for i in range(players)])
+        s.ready(rid)
+        s.close_round(rid)
+        ops += judges + 3
+    return ops
+
+
+def _reads(s, n):
+    """n lecturas típicas de un rerun sobre la última ronda de _workload."""
+    rid = s.open_round()[0] - 1
+    for i in range(n):
+        s.player(rid, f"j{i % 30}")
+        s.user(f"j{i % 30}")
+        s.ballot(rid, "z0")
+        s.round_status(rid)
+    return 4 * n
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Conformidad y coste de los motores de almacenamiento")
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--players", type=int, default=30)
+    ap.add_argument("--judges", type=int, default=5)
+    ap.add_argument("--reads", type=int, default=2000)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engines = {"sqlite": _sqlite_factory(tmp), "memoria": MemoryStorage}
+        for name, make in engines.items():
+            print(f"{name:>8}: {conformance(make)} comprobaciones OK")
+        costs = {}
+        for name, make in engines.items():
+            s = make()
+            t0 = time.perf_counter()
+            ops = _workload(s, args.rounds, args.players, args.judges)
+            s.new_round(args.rounds + 1)
+            t1 = time.perf_counter()
+            nreads = _reads(s, args.reads)
+            t2 = time.perf_counter()
+            costs[name] = ((t1 - t0) / ops * 1e6, (t2 - t1) / nreads * 1e6)
+            print(f"{name:>8}: temporada {ops} ops, {costs[name][0]:.1f} µs/op; lecturas {nreads} ops, {costs[name][1]:.2f} µs/op")
+        w = costs["sqlite"][0] / costs["memoria"][0]
+        r = costs["sqlite"][1] / costs["memoria"][1]
+        print(f"memoria frente a sqlite: {w:.0f}× en la temporada, {r:.0f}× en lecturas")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+# Normalización de frases
+# =============================================================================
+# Dos frases son "la misma" si coinciden tras quitar tildes, mayúsculas,
+# signos de puntuación y espacios repetidos. phrase_hash() resume ese texto
+# normalizado en un entero de 64 bits (blake2b) que se guarda en
+# frases.texto_hash con un índice, así que buscar duplicados es una sola
+# búsqueda por índice aunque el archivo de frases crezca.
+#
+# register() expone phrase_hash a SQL como twowte_hash(texto): lo usan los
+# triggers de la migración 8, de modo que toda conexión que escriba en frases
+# debe registrarla (db.Pool lo hace al abrir cada conexión).
+# =============================================================================
+import hashlib
+import re
+import unicodedata
+
+SQL_FUNCTION = "twowte_hash"
+_NO_ALNUM = re.compile(r"[\W_]+")
+
+
+def normalize(texto):
+    """Texto sin tildes, en minúsculas, sin puntuación y con un espacio entre palabras."""
+    t = texto or ""
+    if not t.isascii():  # sin tildes ni símbolos raros no hace falta descomponer
+        t = unicodedata.normalize("NFKD", t)
+        t = "".join(ch for ch in t if not unicodedata.combining(ch))
+    return _NO_ALNUM.sub(" ", t.casefold()).strip()
+
+
+def phrase_hash(texto):
+    """Entero con signo de 64 bits (cabe en un INTEGER de SQLite) del texto normalizado."""
+    digest = hashlib.blake2b(normalize(texto).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def register(conn):
+    conn.create_function(SQL_FUNCTION, 1, phrase_hash, deterministic=True)